@@ -1,29 +1,88 @@
 import django_filters.rest_framework as filters
+from django import forms
+from django.db.models import Exists, OuterRef
 
-from recipes.models import Recipe, Tag
+from recipes import reference_data
+from recipes.models import Cart, Favorite, Recipe, TagToRecipe
+from recipes.scores import RANKINGS, order_by_ranking
+from recipes.search import search_recipes
+
+
+class SlugListField(forms.MultipleChoiceField):
+    """Repeated query parameter accepting any slug."""
+
+    def valid_value(self, value):
+        return True
+
+
+class SlugListFilter(filters.MultipleChoiceFilter):
+    field_class = SlugListField
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
-    )
+    """Recipe filters applied as EXISTS subqueries.
+
+    Semi-joins never multiply recipe rows, so the list query needs no
+    DISTINCT and no joins to the relation tables.
+    """
+    search = filters.CharFilter(method='filter_search')
+    tags = SlugListFilter(method='filter_tags')
+    author = filters.CharFilter(method='filter_author')
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart',
     )
+    ordering = filters.ChoiceFilter(
+        choices=[(ranking, ranking) for ranking in RANKINGS],
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = ('search', 'tags', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'ordering',)
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_ids = [row['id'] for row in reference_data.tags.get_state().rows
+                   if row['slug'] in value]
+        if not tag_ids:
+            return queryset.none()
+        return queryset.filter(Exists(TagToRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=tag_ids
+        )))
+
+    def filter_author(self, queryset, name, value):
+        user = self.request.user
+        if value == 'me':
+            if not user.is_authenticated:
+                return queryset
+            return queryset.filter(author=user)
+        if not value.isdigit():
+            return queryset.none()
+        return queryset.filter(author_id=int(value))
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(in_favorites__user=self.request.user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
-            return queryset.filter(in_cart__user=self.request.user)
+            return queryset.filter(Exists(Cart.objects.filter(
+                user=self.request.user, recipe=OuterRef('pk')
+            )))
         return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        if not value:
+            return queryset
+        return order_by_ranking(queryset, value)
@@ -0,0 +1,48 @@
+from bisect import bisect_left
+
+from recipes.reference_data import ingredients
+
+
+class IngredientIndex:
+    """In-process sorted-array index over ingredient names.
+
+    Rebuilt from the ingredient reference data whenever its version changes.
+    """
+
+    def __init__(self):
+        self._state = (None, [], [])
+
+    def _get_state(self):
+        reference = ingredients.get_state()
+        if self._state[0] != reference.version:
+            rows = sorted(
+                reference.rows,
+                key=lambda row: (row['name'].lower(), row['id'])
+            )
+            keys = [row['name'].lower() for row in rows]
+            self._state = (reference.version, keys, rows)
+        return self._state
+
+    def search(self, query, limit):
+        """Return up to limit rows, prefix matches ahead of substrings."""
+        _, keys, rows = self._get_state()
+        query = query.lower()
+        start = bisect_left(keys, query)
+
+        results = []
+        for key, row in zip(keys[start:start + limit],
+                            rows[start:start + limit]):
+            if not key.startswith(query):
+                break
+            results.append(row)
+
+        if len(results) < limit:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    results.append(row)
+                    if len(results) >= limit:
+                        break
+        return results
+
+
+ingredient_index = IngredientIndex()
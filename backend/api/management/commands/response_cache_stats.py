@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.response_cache import get_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit and miss counts of the anonymous recipe response cache'
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        served = stats['hit'] + stats['miss']
+        ratio = stats['hit'] / served if served else 0
+        for event, count in stats.items():
+            self.stdout.write(f'{event}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'hit ratio: {ratio:.1%}'))
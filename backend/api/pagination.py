@@ -1,6 +1,108 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.pagination import CountStrategyPaginator
 
 
 class CustomPagination(PageNumberPagination):
+    django_paginator_class = CountStrategyPaginator
+    page_size = 20
+    page_size_query_param = 'limit'
+
+
+class RankedPagination(PageNumberPagination):
+    """Page number pagination over an already ranked in-memory list."""
     page_size = 20
     page_size_query_param = 'limit'
+
+
+class RecipePagination(CustomPagination):
+    """Page number pagination with an opt-in keyset mode.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset
+    pagination over (pub_date, id), which needs neither OFFSET nor COUNT.
+    """
+    cursor_query_param = 'cursor'
+    cursor_date_field = 'pub_date'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_cursor_mode(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.is_cursor_mode(request)
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        date_field = self.cursor_date_field
+        queryset = queryset.order_by(f'-{date_field}', '-id')
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__lt': pub_date})
+                | Q(**{date_field: pub_date, 'id__lt': pk})
+            )
+
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        results = results[:page_size]
+        self.next_position = results[-1] if self.has_next else None
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def encode_cursor(self, recipe):
+        pub_date = getattr(recipe, self.cursor_date_field)
+        position = f'{pub_date.isoformat()}|{recipe.id}'
+        return urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            pub_date, pk = urlsafe_b64decode(encoded).decode().split('|')
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+
+class FeedPagination(RecipePagination):
+    """Keyset-only pagination over the feed_date annotation."""
+    cursor_date_field = 'feed_date'
+
+    def is_cursor_mode(self, request):
+        return True
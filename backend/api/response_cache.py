@@ -0,0 +1,133 @@
+from hashlib import md5
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.constant_values import RESPONSE_CACHE_TIMEOUT
+
+from recipes.cache_versions import (LIST_VERSION_KEY,
+                                    author_version_key,
+                                    get_version,
+                                    get_versions,
+                                    recipe_version_key)
+from recipes.reference_data import ingredients, tags
+
+RESPONSE_CACHE_PARAMS = (
+    'author',
+    'cursor',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'limit',
+    'ordering',
+    'page',
+    'tags',
+)
+RESPONSE_CACHE_EVENTS = ('hit', 'miss', 'bypass')
+
+
+def record(event):
+    key = f'recipe_response_cache:{event}'
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_stats():
+    keys = [f'recipe_response_cache:{event}'
+            for event in RESPONSE_CACHE_EVENTS]
+    values = cache.get_many(keys)
+    return {event: values.get(key, 0)
+            for event, key in zip(RESPONSE_CACHE_EVENTS, keys)}
+
+
+def normalize_params(query_params):
+    """Cache key part for the query, or None if it has unknown params."""
+    if set(query_params) - set(RESPONSE_CACHE_PARAMS):
+        return None
+    return '&'.join(
+        f'{name}={",".join(sorted(set(query_params.getlist(name))))}'
+        for name in RESPONSE_CACHE_PARAMS if name in query_params
+    )
+
+
+class AnonymousResponseCacheMixin:
+    """Cache anonymous list and detail responses of a viewset.
+
+    Anonymous responses carry no per-user flags, so they are shared by all
+    anonymous clients. Keys are versioned by the recipe, its author and the
+    reference data; signals bump those versions when the data changes.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        params = normalize_params(request.query_params)
+        if params is None:
+            record('bypass')
+            return super().list(request, *args, **kwargs)
+
+        versions = get_versions(
+            LIST_VERSION_KEY, tags.version_key, ingredients.version_key
+        )
+        key = self._cache_key('recipe_list_response', request, params)
+        version = md5(':'.join(versions).encode()).hexdigest()
+        data = cache.get(key, version=version)
+        if data is not None:
+            return self._hit(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, RESPONSE_CACHE_TIMEOUT,
+                      version=version)
+        return self._miss(response)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().retrieve(request, *args, **kwargs)
+
+        recipe_id = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not recipe_id.isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        recipe_id = int(recipe_id)
+        versions = get_versions(
+            recipe_version_key(recipe_id),
+            tags.version_key,
+            ingredients.version_key,
+        )
+        key = self._cache_key('recipe_response', request, recipe_id)
+        version = md5(':'.join(versions).encode()).hexdigest()
+        cached = cache.get(key, version=version)
+        if cached is not None:
+            author_id, author_version, data = cached
+            if get_version(author_version_key(author_id)) == author_version:
+                return self._hit(data)
+
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            author_id = response.data['author']['id']
+            author_version = get_version(author_version_key(author_id))
+            cache.set(key, (author_id, author_version, response.data),
+                      RESPONSE_CACHE_TIMEOUT, version=version)
+        return self._miss(response)
+
+    def _cache_key(self, prefix, request, part):
+        # Responses contain absolute URLs, so the host is part of the key.
+        origin = request.build_absolute_uri('/')
+        return '{}:{}'.format(
+            prefix, md5(f'{origin}|{part}'.encode()).hexdigest()
+        )
+
+    def _hit(self, data):
+        record('hit')
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def _miss(self, response):
+        record('miss')
+        response['X-Cache'] = 'MISS'
+        return response
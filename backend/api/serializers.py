@@ -1,12 +1,21 @@
+import json
+import os
+import uuid
+from collections import Counter
+
 from drf_extra_fields.fields import Base64ImageField
+from django.core.files.uploadedfile import UploadedFile
 from django.db import transaction
+from django.http import QueryDict
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
 from backend.constant_values import (INGREDIENT_MAX_AMOUNT,
                                      INGREDIENT_MIN_AMOUNT,
                                      COOKING_TIME_MAX_VALUE,
-                                     COOKING_TIME_MIN_VALUE)
+                                     COOKING_TIME_MIN_VALUE,
+                                     RECIPE_IMAGE_MAX_SIZE)
+from recipes import reference_data
 from recipes.models import (Tag,
                             Ingredient,
                             IngredientInRecipe,
@@ -14,7 +23,61 @@ from recipes.models import (Tag,
                             Favorite,
                             Cart,
                             User)
+from recipes.counters import change_counter
+from recipes.images import rendition_urls, schedule_renditions
+from recipes.search import index_recipes
 from users.serializers import CustomUserSerializer
+from .uploads import RequestTooLarge
+
+
+class RecipeImageField(Base64ImageField):
+    """Image given either as a base64 string or as a multipart upload."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            if data.size > RECIPE_IMAGE_MAX_SIZE:
+                raise serializers.ValidationError(
+                    RequestTooLarge.default_detail
+                )
+            extension = os.path.splitext(data.name)[1].lower()
+            data.name = f'{uuid.uuid4()}{extension}'
+            return serializers.ImageField.to_internal_value(self, data)
+        if (isinstance(data, str)
+                and len(data) * 3 // 4 > RECIPE_IMAGE_MAX_SIZE):
+            raise serializers.ValidationError(RequestTooLarge.default_detail)
+        return super().to_internal_value(data)
+
+
+class BulkPrimaryKeyField(serializers.PrimaryKeyRelatedField):
+    """Primary key field whose objects are resolved in bulk by the parent."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+def resolve_ids(reference, ids):
+    counts = Counter(ids)
+    objects = reference.in_bulk(counts)
+    duplicates = sorted(pk for pk, count in counts.items() if count > 1)
+    missing = sorted(pk for pk in counts if pk not in objects)
+
+    errors = []
+    if duplicates:
+        errors.append(
+            f'Duplicate ids: {", ".join(map(str, duplicates))}'
+        )
+    if missing:
+        errors.append(
+            f'Objects do not exist: {", ".join(map(str, missing))}'
+        )
+    if errors:
+        raise serializers.ValidationError(errors)
+    return objects
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -50,9 +113,7 @@ class ShowIngredientInRecipeSerializer(serializers.ModelSerializer):
 
 
 class AddIngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = BulkPrimaryKeyField(queryset=Ingredient.objects.all())
 
     amount = serializers.IntegerField(
         min_value=INGREDIENT_MIN_AMOUNT,
@@ -63,20 +124,13 @@ class AddIngredientInRecipeSerializer(serializers.ModelSerializer):
         model = IngredientInRecipe
         fields = ('id', 'amount')
 
-    def create(self, validated_data):
-        ingredient = validated_data.get('id')
-        amount = validated_data.get('amount')
-        recipe = self.context.get('recipe')
-        return IngredientInRecipe.objects.create(
-            ingredient=ingredient,
-            amount=amount,
-            recipe=recipe
-        )
-
 
 class GetRecipeSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
+    image_renditions = serializers.SerializerMethodField(
+        'get_image_renditions'
+    )
     ingredients = serializers.SerializerMethodField('get_ingredients')
     is_favorited = serializers.SerializerMethodField('check_is_favorite')
     is_in_shopping_cart = serializers.SerializerMethodField(
@@ -86,7 +140,23 @@ class GetRecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        fields = (
+            'id',
+            'author',
+            'image',
+            'image_renditions',
+            'ingredients',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'tags',
+            'name',
+            'text',
+            'cooking_time',
+            'pub_date',
+        )
+
+    def get_image_renditions(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
 
     def get_ingredients(self, obj):
         ingredients = obj.IngredientsToRecipes.all()
@@ -96,6 +166,8 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = request.user
         return obj.in_favorites.filter(user=user).exists()
 
@@ -103,6 +175,8 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = request.user
         return obj.in_cart.filter(user=user).exists()
 
@@ -113,15 +187,65 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         min_value=COOKING_TIME_MIN_VALUE,
         max_value=COOKING_TIME_MAX_VALUE
     )
-    image = Base64ImageField(max_length=None, use_url=True)
-    ingredients = AddIngredientInRecipeSerializer(many=True, write_only=True)
-    tags = serializers.SlugRelatedField(
-        many=True, queryset=Tag.objects.all(), slug_field='id'
-    )
+    image = RecipeImageField(max_length=None, use_url=True)
+    ingredients = AddIngredientInRecipeSerializer(many=True,
+                                                  write_only=True,
+                                                  allow_empty=False)
+    tags = BulkPrimaryKeyField(many=True, queryset=Tag.objects.all())
 
     class Meta:
         model = Recipe
-        fields = '__all__'
+        fields = (
+            'id',
+            'author',
+            'cooking_time',
+            'image',
+            'ingredients',
+            'tags',
+            'name',
+            'text',
+            'image_renditions',
+            'pub_date',
+        )
+
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = self.parse_form_data(data)
+        return super().to_internal_value(data)
+
+    def parse_form_data(self, data):
+        """Decode nested fields of a multipart/form-data request."""
+        parsed = data.dict()
+        if 'ingredients' in data:
+            try:
+                parsed['ingredients'] = json.loads(data['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'ingredients': ['Expected a JSON list.']}
+                )
+        tags = data.getlist('tags')
+        if len(tags) == 1 and tags[0].startswith('['):
+            try:
+                tags = json.loads(tags[0])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'tags': ['Expected a JSON list.']}
+                )
+        parsed['tags'] = tags
+        return parsed
+
+    def validate_ingredients(self, value):
+        ingredients = resolve_ids(
+            reference_data.ingredients, [item['id'] for item in value]
+        )
+        return [
+            {'id': ingredients[item['id']], 'amount': item['amount']}
+            for item in value
+        ]
+
+    def validate_tags(self, value):
+        tags = resolve_ids(reference_data.tags, value)
+        return [tags[pk] for pk in value]
 
     def validate(self, data):
         user = self.context.get('request').user
@@ -154,31 +278,64 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         author = self.context.get('request').user
-        recipe = Recipe.objects.create(author=author, **validated_data)
-        self._bulk_create_ingredients(recipe, ingredients_data)
-        recipe.tags.set(tags_data)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(author=author, **validated_data)
+            self._bulk_create_ingredients(recipe, ingredients_data)
+            recipe.tags.set(tags_data)
+            change_counter(User, author.id, 'recipes_count', 1)
+            schedule_renditions(recipe)
         return recipe
 
+    def _update_ingredients(self, recipe, ingredients_data):
+        wanted = {item['id'].id: item for item in ingredients_data}
+        to_delete = []
+        to_update = []
+        current = set()
+        for row in recipe.IngredientsToRecipes.all():
+            item = wanted.get(row.ingredient_id)
+            if item is None or row.ingredient_id in current:
+                to_delete.append(row.id)
+                continue
+            current.add(row.ingredient_id)
+            if row.amount != item['amount']:
+                row.amount = item['amount']
+                to_update.append(row)
+
+        if to_delete:
+            IngredientInRecipe.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            IngredientInRecipe.objects.bulk_update(to_update, ['amount'])
+        added = [item for pk, item in wanted.items() if pk not in current]
+        if added:
+            # bulk_create sends no signals, so reindex the names here.
+            self._bulk_create_ingredients(recipe, added)
+            index_recipes(recipe.pk)
+
     def update(self, instance, validated_data):
         ingredients_data = validated_data.get('ingredients')
         tags_data = validated_data.get('tags')
 
-        instance.related_tags.all().delete()
-
         if not ingredients_data:
             raise serializers.ValidationError('No ingredients provided')
 
         with transaction.atomic():
-            instance.IngredientsToRecipes.all().delete()
-            self._bulk_create_ingredients(instance, ingredients_data)
-
-        instance.name = validated_data.get('name')
-        instance.text = validated_data.get('text')
-        if validated_data.get('image') is not None:
-            instance.image = validated_data.get('image')
-        instance.cooking_time = validated_data.get('cooking_time')
-        instance.tags.set(tags_data)
-        instance.save()
+            self._update_ingredients(instance, ingredients_data)
+            instance.tags.set(tags_data)
+
+            instance.name = validated_data.get('name')
+            instance.text = validated_data.get('text')
+            image = validated_data.get('image')
+            if image is not None:
+                instance.image = image
+                instance.image_renditions = {}
+            instance.cooking_time = validated_data.get('cooking_time')
+            # Leave the F() counters to concurrent favorite and cart writes.
+            update_fields = ['name', 'text', 'cooking_time']
+            if image is not None:
+                update_fields += ['image', 'image_renditions']
+            instance.save(update_fields=update_fields)
+            if image is not None:
+                schedule_renditions(instance)
         return instance
 
 
@@ -0,0 +1,123 @@
+import csv
+import tempfile
+
+from django.conf import settings
+from django.db.models import Sum
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from backend.constant_values import (SHOPPING_CART_CHUNK_SIZE,
+                                     SHOPPING_CART_FILE_NAME,
+                                     SHOPPING_CART_PDF_FONT_SIZE,
+                                     SHOPPING_CART_PDF_MARGIN,
+                                     SHOPPING_CART_PDF_TITLE,
+                                     SHOPPING_CART_SPOOL_SIZE)
+from recipes.models import IngredientInRecipe
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer that returns the written row."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_cart_rows(user):
+    return IngredientInRecipe.objects.filter(
+        recipe__in_cart__user=user
+    ).values_list(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name').iterator(
+        chunk_size=SHOPPING_CART_CHUNK_SIZE
+    )
+
+
+def stream_txt(rows):
+    separator = ''
+    for name, measurement_unit, amount in rows:
+        yield f'{separator}{name} - {amount} {measurement_unit}'.encode()
+        separator = '\n'
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit')).encode()
+    for name, measurement_unit, amount in rows:
+        yield writer.writerow((name, amount, measurement_unit)).encode()
+
+
+def render_pdf(rows):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT)
+        )
+
+    pdf_file = tempfile.SpooledTemporaryFile(
+        max_size=SHOPPING_CART_SPOOL_SIZE
+    )
+    page = canvas.Canvas(pdf_file, pagesize=A4)
+    width, height = A4
+    line_height = SHOPPING_CART_PDF_FONT_SIZE * 1.5
+    top = height - SHOPPING_CART_PDF_MARGIN
+
+    def start_page():
+        page.setFont(PDF_FONT_NAME, SHOPPING_CART_PDF_FONT_SIZE)
+        return top
+
+    y = start_page()
+    page.drawString(SHOPPING_CART_PDF_MARGIN, y, SHOPPING_CART_PDF_TITLE)
+    y -= line_height * 2
+
+    for name, measurement_unit, amount in rows:
+        if y < SHOPPING_CART_PDF_MARGIN:
+            page.showPage()
+            y = start_page()
+        page.drawString(
+            SHOPPING_CART_PDF_MARGIN, y,
+            f'• {name} - {amount} {measurement_unit}'
+        )
+        y -= line_height
+
+    page.save()
+    pdf_file.seek(0)
+    return pdf_file
+
+
+def shopping_cart_txt_response(rows):
+    response = StreamingHttpResponse(stream_txt(rows),
+                                     content_type='text/plain')
+    response['Content-Disposition'] = (
+        f"attachment; filename='{SHOPPING_CART_FILE_NAME}.txt'"
+    )
+    return response
+
+
+def shopping_cart_csv_response(rows):
+    response = StreamingHttpResponse(stream_csv(rows),
+                                     content_type='text/csv')
+    response['Content-Disposition'] = (
+        f"attachment; filename='{SHOPPING_CART_FILE_NAME}.csv'"
+    )
+    return response
+
+
+def shopping_cart_pdf_response(rows):
+    return FileResponse(render_pdf(rows),
+                        as_attachment=True,
+                        filename=f'{SHOPPING_CART_FILE_NAME}.pdf',
+                        content_type='application/pdf')
+
+
+SHOPPING_CART_RESPONSES = {
+    'txt': shopping_cart_txt_response,
+    'csv': shopping_cart_csv_response,
+    'pdf': shopping_cart_pdf_response,
+}
@@ -0,0 +1,192 @@
+from django.conf import settings
+from django.db.models.signals import (m2m_changed,
+                                      post_delete,
+                                      post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .serializers import GetRecipeSerializer
+from recipes.cache_versions import (invalidate_author,
+                                    invalidate_counts,
+                                    invalidate_recipes)
+from recipes.cook_index import record_change
+from recipes.models import (Cart,
+                            Favorite,
+                            Ingredient,
+                            IngredientInRecipe,
+                            Recipe,
+                            RecipeScore,
+                            Tag,
+                            TagToRecipe)
+from recipes.reference_data import ingredients, tags
+from recipes.search import INDEXED_FIELDS, index_recipes
+from recipes.timeline import backfill_follow, remove_follow, schedule_fan_out
+from users.models import Follow, User
+from users.serializers import CustomUserSerializer
+
+RECIPE_RESPONSE_FIELDS = frozenset(GetRecipeSerializer.Meta.fields)
+
+# Concrete author columns rendered in recipe responses.
+AUTHOR_RESPONSE_FIELDS = frozenset(CustomUserSerializer.Meta.fields) & {
+    field.name for field in User._meta.concrete_fields
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+@receiver(post_save, sender=TagToRecipe)
+@receiver(post_delete, sender=TagToRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_pagination_counts(sender, **kwargs):
+    invalidate_counts()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    tags.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    ingredients.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created and settings.RECIPE_FEED_FANOUT:
+        schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def fill_timeline(sender, instance, created, **kwargs):
+    if created and settings.RECIPE_FEED_FANOUT:
+        backfill_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(sender, instance, **kwargs):
+    if settings.RECIPE_FEED_FANOUT:
+        remove_follow(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_response(sender, instance, update_fields=None,
+                               **kwargs):
+    if (update_fields is not None
+            and not RECIPE_RESPONSE_FIELDS & set(update_fields)):
+        return
+    invalidate_recipes(instance.pk)
+
+
+# Favorites and carts only change per-user flags, which anonymous
+# responses never show, so they leave the cache alone.
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+@receiver(post_save, sender=TagToRecipe)
+@receiver(post_delete, sender=TagToRecipe)
+def invalidate_related_recipe_response(sender, instance, **kwargs):
+    invalidate_recipes(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_tagged_recipe_responses(sender, instance, action, reverse,
+                                       pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_recipes(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_recipes(*instance.recipes.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_recipes(*pk_set)
+
+
+@receiver(pre_save, sender=User)
+def detect_author_response_change(sender, instance, update_fields=None,
+                                  **kwargs):
+    """Flag saves that change the author data shown with recipes."""
+    fields = AUTHOR_RESPONSE_FIELDS
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    instance._author_response_changed = False
+    if not fields or instance._state.adding:
+        return
+    current = User.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._author_response_changed = current is None or any(
+        current[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, **kwargs):
+    if getattr(instance, '_author_response_changed', True):
+        invalidate_author(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_author_responses(sender, instance, **kwargs):
+    invalidate_author(instance.pk)
+
+
+@receiver(pre_save, sender=Recipe)
+def detect_search_change(sender, instance, update_fields=None, **kwargs):
+    """Flag saves that change the indexed recipe columns."""
+    fields = set(INDEXED_FIELDS)
+    if update_fields is not None:
+        fields &= set(update_fields)
+    instance._search_changed = instance._state.adding
+    if not fields or instance._state.adding:
+        return
+    current = Recipe.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._search_changed = current is None or any(
+        current[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    if getattr(instance, '_search_changed', True):
+        index_recipes(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def index_deleted_recipe(sender, instance, **kwargs):
+    index_recipes(instance.pk)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def index_recipe_ingredients(sender, instance, **kwargs):
+    index_recipes(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def index_renamed_ingredient(sender, instance, created, **kwargs):
+    if not created:
+        index_recipes(*instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def update_cook_index(sender, instance, **kwargs):
+    record_change(instance.pk)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def update_cook_index_ingredients(sender, instance, **kwargs):
+    record_change(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.get_or_create(recipe=instance)
@@ -0,0 +1,748 @@
+import io
+import json
+import re
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.http import QueryDict
+from django.test import (SimpleTestCase,
+                         TestCase,
+                         TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from backend.constant_values import SUBSCRIPTIONS_RECIPES_MAX
+from .filter import RecipeFilter
+from .serializers import CreateRecipeSerializer
+from recipes import images
+from recipes.cook_index import CookIndex
+from recipes.cache_versions import COUNT_VERSION_KEY, get_version
+from recipes.management.commands.create_ingredients import read_json
+from recipes.models import (Cart,
+                            Favorite,
+                            Ingredient,
+                            IngredientInRecipe,
+                            Recipe,
+                            RecipeScore,
+                            Tag,
+                            TagToRecipe,
+                            TimelineEntry)
+from recipes.recommendations import compute_similarities
+from recipes.search import SEARCH_VERSION_KEY
+from recipes.timeline import rebuild_timelines
+from users.models import Follow, User
+
+
+class RecipeDataMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(username=f'user{number}',
+                                email=f'user{number}@example.com',
+                                first_name='Имя', last_name='Фамилия')
+            for number in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(5)
+        ]
+        cls.recipes = []
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text=f'Описание {number}',
+                cooking_time=number + 1,
+                author=cls.users[number % len(cls.users)],
+            )
+            recipe.tags.set(cls.tags[:number % len(cls.tags) + 1])
+            IngredientInRecipe.objects.bulk_create([
+                IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                                   amount=amount + 1)
+                for amount, ingredient in enumerate(
+                    cls.ingredients[number % 3:number % 3 + 3]
+                )
+            ])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+
+
+class RecipeListQueriesTest(RecipeDataMixin, APITestCase):
+    """The recipe list costs a fixed number of queries per page."""
+
+    def assert_list_queries(self, limit, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        for item in response.data['results']:
+            self.assertTrue(item['ingredients'])
+            self.assertTrue(item['tags'])
+
+    def test_anonymous_list(self):
+        # count, recipes with authors, tags, ingredients
+        self.assert_list_queries(2, 4)
+        cache.clear()
+        self.assert_list_queries(10, 4)
+
+    def test_authenticated_list(self):
+        self.client.force_authenticate(self.users[0])
+        # count, recipes with authors and flags, tags, ingredients,
+        # followed authors
+        self.assert_list_queries(2, 5)
+        cache.clear()
+        self.assert_list_queries(10, 5)
+
+
+class RecipeCursorTest(RecipeDataMixin, APITestCase):
+    """Keyset pages over (pub_date, id) survive pub_date ties."""
+
+    def test_pages_with_ties(self):
+        dates = Recipe.objects.order_by('id').values_list('pub_date',
+                                                          flat=True)
+        first, last = dates[0], dates[len(dates) - 1]
+        for number, recipe in enumerate(self.recipes):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=(first, last)[number % 3 == 0]
+            )
+        ids = []
+        url = '/api/recipes/?cursor=&limit=5'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 5)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True)))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+
+class RecipePayloadTest(RecipeDataMixin, APITestCase):
+
+    def test_internal_columns_hidden(self):
+        recipe = self.recipes[0]
+        for url in ('/api/recipes/', f'/api/recipes/{recipe.id}/'):
+            response = self.client.get(url)
+            item = response.data.get('results', [response.data])[0]
+            self.assertEqual(set(item), {
+                'id', 'author', 'image', 'image_renditions', 'ingredients',
+                'is_favorited', 'is_in_shopping_cart', 'tags', 'name',
+                'text', 'cooking_time', 'pub_date',
+            })
+
+
+class IsSubscribedTest(RecipeDataMixin, APITestCase):
+    """is_subscribed is read from one followed-author query per request."""
+
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create(username='reader',
+                                          email='reader@example.com')
+        Follow.objects.create(subscriber=self.reader,
+                              subcribed_to=self.users[0])
+        # A follower of the reader must not count as a subscription.
+        Follow.objects.create(subscriber=self.users[1],
+                              subcribed_to=self.reader)
+        self.client.force_authenticate(self.reader)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        follow_queries = [
+            query for query in context.captured_queries
+            if Follow._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(follow_queries), 1)
+        return response.data
+
+    def assert_subscriptions(self, users):
+        for user in users:
+            self.assertEqual(user['is_subscribed'],
+                             user['id'] == self.users[0].id, user['id'])
+
+    def test_recipe_list(self):
+        with self.assertNumQueries(5):
+            data = self.get('/api/recipes/?limit=12')
+        self.assert_subscriptions(item['author'] for item in data['results'])
+
+    def test_recipe_detail(self):
+        for recipe in self.recipes[:3]:
+            # recipe with author and flags, tags, ingredients,
+            # followed authors
+            with self.assertNumQueries(4):
+                data = self.get(f'/api/recipes/{recipe.id}/')
+            self.assert_subscriptions([data['author']])
+
+    def test_user_list(self):
+        # users, followed authors
+        with self.assertNumQueries(2):
+            data = self.get('/api/users/')
+        self.assertEqual(len(data), len(self.users) + 1)
+        self.assert_subscriptions(data)
+
+
+class SubscriptionsTest(APITestCase):
+
+    def test_fixed_page_size(self):
+        reader = User.objects.create(username='reader',
+                                     email='reader@example.com')
+        for number in range(8):
+            author = User.objects.create(username=f'author{number}',
+                                         email=f'author{number}@example.com')
+            Follow.objects.create(subscriber=reader, subcribed_to=author)
+        self.client.force_authenticate(reader)
+        response = self.client.get('/api/users/subscriptions/?limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 8)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_recipes_limit_capped(self):
+        reader = User.objects.create(username='reader',
+                                     email='reader@example.com')
+        author = User.objects.create(username='author',
+                                     email='author@example.com')
+        Follow.objects.create(subscriber=reader, subcribed_to=author)
+        Recipe.objects.bulk_create([
+            Recipe(name=f'Рецепт {number}', text=f'Описание {number}',
+                   cooking_time=1, author=author)
+            for number in range(SUBSCRIPTIONS_RECIPES_MAX + 5)
+        ])
+        self.client.force_authenticate(reader)
+        response = self.client.get(
+            '/api/users/subscriptions/?recipes_limit=100000'
+        )
+        self.assertEqual(len(response.data['results'][0]['recipes']),
+                         SUBSCRIPTIONS_RECIPES_MAX)
+
+
+class ResponseCacheTest(RecipeDataMixin, APITestCase):
+
+    def assert_cache(self, state):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], state)
+
+    def change(self, func):
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+
+    def test_unrelated_writes_keep_lists(self):
+        self.assert_cache('MISS')
+        user = self.users[0]
+        self.change(lambda: Favorite.objects.create(
+            user=user, recipe=self.recipes[0]
+        ))
+        self.change(lambda: Cart.objects.create(
+            user=user, recipe=self.recipes[0]
+        ))
+        user.set_password('new-password')
+        self.change(user.save)
+        self.change(lambda: user.save(update_fields=['last_login']))
+        self.assert_cache('HIT')
+
+    def test_author_change_drops_lists(self):
+        self.assert_cache('MISS')
+        user = self.users[0]
+        user.first_name = 'Другое'
+        self.change(user.save)
+        self.assert_cache('MISS')
+        self.assert_cache('HIT')
+
+    def test_recipe_change_drops_lists(self):
+        self.assert_cache('MISS')
+        recipe = self.recipes[0]
+        recipe.name = 'Другое'
+        self.change(recipe.save)
+        self.assert_cache('MISS')
+
+
+class SearchIndexTest(RecipeDataMixin, TestCase):
+
+    def assert_reindexed(self, func, reindexed=True):
+        version = get_version(SEARCH_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+        changed = get_version(SEARCH_VERSION_KEY) != version
+        self.assertEqual(changed, reindexed)
+
+    def test_unindexed_changes_skip_reindex(self):
+        recipe = self.recipes[0]
+        recipe.cooking_time += 1
+        self.assert_reindexed(recipe.save, reindexed=False)
+        recipe.image_renditions = {'thumb': 'thumb.webp'}
+        self.assert_reindexed(
+            lambda: recipe.save(update_fields=['image_renditions']),
+            reindexed=False,
+        )
+
+    def test_indexed_changes_reindex(self):
+        recipe = self.recipes[0]
+        recipe.name = 'Другое'
+        self.assert_reindexed(recipe.save)
+        recipe.text = 'Другое описание'
+        self.assert_reindexed(lambda: recipe.save(update_fields=['text']))
+
+    def test_added_ingredient_reindexes(self):
+        recipe = self.recipes[0]
+        ingredients = [
+            {'id': ingredient, 'amount': 1}
+            for ingredient in self.ingredients
+        ]
+        self.assert_reindexed(
+            lambda: CreateRecipeSerializer()._update_ingredients(
+                recipe, ingredients
+            )
+        )
+
+
+class CounterWriteBackTest(RecipeDataMixin, APITestCase):
+
+    def test_recipe_update_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=F('favorites_count') + 1,
+            cart_count=F('cart_count') + 1,
+        )
+        CreateRecipeSerializer().update(recipe, {
+            'name': 'Другое', 'text': 'Другое описание', 'cooking_time': 5,
+            'tags': self.tags[:1],
+            'ingredients': [{'id': self.ingredients[0], 'amount': 1}],
+        })
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Другое')
+        self.assertEqual((recipe.favorites_count, recipe.cart_count), (1, 1))
+
+    def test_set_password_keeps_counters(self):
+        user = User.objects.get(pk=self.users[0].pk)
+        user.set_password('old-password')
+        user.save(update_fields=['password'])
+        User.objects.filter(pk=user.pk).update(
+            followers_count=F('followers_count') + 1,
+        )
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'old-password',
+            'new_password': 'new-Password-123',
+        })
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('new-Password-123'))
+        self.assertEqual(user.followers_count, 1)
+
+
+class CountVersionTest(RecipeDataMixin, TestCase):
+
+    def test_version_bumped_after_commit(self):
+        version = get_version(COUNT_VERSION_KEY)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Favorite.objects.create(user=self.users[0],
+                                    recipe=self.recipes[0])
+            self.assertEqual(get_version(COUNT_VERSION_KEY), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_version(COUNT_VERSION_KEY), version)
+
+
+class RenditionScheduleTest(RecipeDataMixin, TestCase):
+
+    @override_settings(IMAGE_RENDITION_WORKERS=1)
+    def test_broken_pool_is_replaced(self):
+        broken = mock.Mock(**{'submit.side_effect': BrokenProcessPool})
+        recipe = self.recipes[0]
+        recipe.image = 'recipes/image/missing.png'
+        with mock.patch.object(images, '_executor', broken), \
+                mock.patch.object(images, 'get_executor',
+                                  return_value=broken), \
+                self.assertLogs(images.logger, 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                images.schedule_renditions(recipe)
+            self.assertIsNone(images._executor)
+        self.assertEqual(broken.submit.call_count, 2)
+        broken.shutdown.assert_called_once_with(wait=False)
+
+
+class SimilarityTest(RecipeDataMixin, TestCase):
+
+    def test_scores_use_favorite_rows(self):
+        # Rows written without the API leave favorites_count at zero.
+        Favorite.objects.bulk_create([
+            Favorite(user=user, recipe=recipe)
+            for user in self.users[:2]
+            for recipe in self.recipes[:2]
+        ])
+        first, second = self.recipes[:2]
+        for recipe_ids in (None, [first.id]):
+            scores = dict(compute_similarities(recipe_ids))
+            self.assertEqual(scores[first.id], [(second.id, 1.0)])
+
+
+class ReadJsonTest(SimpleTestCase):
+
+    def read(self, text):
+        return list(read_json(io.StringIO(text)))
+
+    def test_items_across_reads(self):
+        items = [{'name': f'Ингредиент {number}', 'measurement_unit': 'г'}
+                 for number in range(5000)]
+        rows = self.read(json.dumps(items, ensure_ascii=False, indent=1))
+        self.assertEqual(rows, [(item['name'], item['measurement_unit'])
+                                for item in items])
+        self.assertEqual(self.read(' [ ] '), [])
+
+    def test_malformed_item_position(self):
+        text = '[{"name": "a", "measurement_unit": "г"}, {"name": x}]'
+        with self.assertRaisesMessage(
+            CommandError, f'Invalid JSON at character {text.index("x")}'
+        ):
+            self.read(text)
+        for text in ('[{"name": "a"}]', '[{"name": "a"', '{}'):
+            with self.assertRaises(CommandError):
+                self.read(text)
+
+
+class RecipeIngredientsUpdateTest(RecipeDataMixin, TestCase):
+
+    def test_unchanged_rows_kept(self):
+        recipe = self.recipes[0]
+        before = {row.ingredient_id: row for row in
+                  recipe.IngredientsToRecipes.all()}
+        kept, changed, removed = self.ingredients[:3]
+        added = self.ingredients[3]
+        CreateRecipeSerializer().update(recipe, {
+            'name': recipe.name, 'text': recipe.text, 'cooking_time': 1,
+            'tags': self.tags[:1],
+            'ingredients': [
+                {'id': kept, 'amount': before[kept.id].amount},
+                {'id': changed, 'amount': 50},
+                {'id': added, 'amount': 7},
+            ],
+        })
+        after = {row.ingredient_id: row for row in
+                 recipe.IngredientsToRecipes.all()}
+        self.assertEqual(set(after), {kept.id, changed.id, added.id})
+        self.assertNotIn(removed.id, after)
+        self.assertEqual(after[kept.id].id, before[kept.id].id)
+        self.assertEqual(after[changed.id].id, before[changed.id].id)
+        self.assertEqual(after[changed.id].amount, 50)
+        self.assertEqual(after[added.id].amount, 7)
+
+
+class ReferenceDataTest(RecipeDataMixin, APITestCase):
+
+    def test_etag_matches_exactly(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        for header, status in (
+            (etag, 304),
+            (f'"other", {etag}', 304),
+            ('*', 304),
+            (f'"stale{etag}"', 200),
+            (etag[:-2] + '"', 200),
+        ):
+            response = self.client.get('/api/tags/',
+                                       HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, status, header)
+
+    def test_version_bumped_after_commit(self):
+        etag = self.client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            Tag.objects.create(name='Новый', color='#ffffff', slug='new')
+            self.assertEqual(self.client.get('/api/tags/')['ETag'], etag)
+        for callback in callbacks:
+            callback()
+        response = self.client.get('/api/tags/')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('new', [tag['slug'] for tag in response.data])
+
+
+class FeedTest(RecipeDataMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reader = User.objects.create(username='reader',
+                                          email='reader@example.com')
+        for author in self.users[:2]:
+            Follow.objects.create(subscriber=self.reader, subcribed_to=author)
+        self.client.force_authenticate(self.reader)
+
+    def create_recipes(self, count):
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipes = [
+                Recipe.objects.create(name=f'Новый {number}',
+                                      text=f'Текст {number}',
+                                      cooking_time=1,
+                                      author=self.users[number % 3])
+                for number in range(count)
+            ]
+            self.assertFalse(TimelineEntry.objects.filter(
+                recipe__in=recipes
+            ).exists())
+        for callback in callbacks:
+            callback()
+
+    def read_feed(self, limit):
+        ids = []
+        url = f'/api/recipes/feed/?limit={limit}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), limit)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def expected_feed(self):
+        return list(Recipe.objects.filter(
+            author__in=self.users[:2]
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+    def test_pull_feed(self):
+        self.create_recipes(6)
+        self.assertEqual(self.read_feed(5), self.expected_feed())
+
+    @override_settings(RECIPE_FEED_FANOUT=True,
+                       RECIPE_FEED_FANOUT_WORKERS=0)
+    def test_push_feed(self):
+        rebuild_timelines()
+        self.create_recipes(6)
+        self.assertEqual(self.read_feed(5), self.expected_feed())
+
+    def test_rebuild_given_users(self):
+        other = self.users[2]
+        Follow.objects.create(subscriber=other, subcribed_to=self.users[0])
+        rebuild_timelines()
+        entries = set(TimelineEntry.objects.filter(
+            user=other
+        ).values_list('id', flat=True))
+        TimelineEntry.objects.filter(user=self.reader).delete()
+        rebuild_timelines([self.reader.id])
+        self.assertEqual(set(TimelineEntry.objects.filter(
+            user=other
+        ).values_list('id', flat=True)), entries)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(),
+            len(self.expected_feed()),
+        )
+
+
+class CookIndexTest(RecipeDataMixin, APITestCase):
+    """/recipes/cook/ matches a brute-force ranking as recipes change."""
+
+    QUERIES = ((0,), (0, 1), (0, 2, 4), (1, 2, 3, 4))
+
+    def setUp(self):
+        super().setUp()
+        self.index = CookIndex()
+        patcher = mock.patch('api.views.cook_index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def change(self, func):
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+
+    def add_recipe(self, number, ingredients, cooking_time):
+        recipe = Recipe.objects.create(
+            name=f'Новый {number}', text=f'Новый текст {number}',
+            cooking_time=cooking_time, author=self.users[0],
+        )
+        for ingredient in ingredients:
+            IngredientInRecipe.objects.create(recipe=recipe,
+                                              ingredient=ingredient,
+                                              amount=1)
+        return recipe
+
+    def brute_force(self, ingredient_ids):
+        ranked = []
+        for recipe in Recipe.objects.prefetch_related('IngredientsToRecipes'):
+            own = {row.ingredient_id
+                   for row in recipe.IngredientsToRecipes.all()}
+            matched = len(own & ingredient_ids)
+            if matched:
+                missing = len(own) - matched
+                ranked.append((
+                    (-matched / len(own), missing, recipe.cooking_time,
+                     recipe.id),
+                    (recipe.id, matched, missing),
+                ))
+        return [row for _, row in sorted(ranked)]
+
+    def assert_rankings(self):
+        for query in self.QUERIES:
+            ingredient_ids = {self.ingredients[number].id
+                              for number in query}
+            rows = []
+            url = '/api/recipes/cook/?limit=4&ingredients={}'.format(
+                ','.join(map(str, ingredient_ids))
+            )
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                rows.extend(
+                    (item['id'], item['matched_count'],
+                     item['missing_count'])
+                    for item in response.data['results']
+                )
+                url = response.data['next']
+            self.assertEqual(rows, self.brute_force(ingredient_ids), query)
+
+    def test_ranking_follows_changes(self):
+        self.assert_rankings()
+
+        ingredients = self.ingredients
+        with mock.patch.object(self.index, '_rebuild') as rebuild:
+            self.change(lambda: self.add_recipe(1, ingredients[:1], 3))
+            self.change(lambda: self.add_recipe(2, ingredients, 3))
+            self.change(lambda: self.add_recipe(3, ingredients[3:], 1))
+            edited = self.recipes[0]
+            self.change(lambda: edited.IngredientsToRecipes.filter(
+                ingredient=ingredients[0]
+            ).delete())
+            self.change(lambda: IngredientInRecipe.objects.create(
+                recipe=edited, ingredient=ingredients[4], amount=1
+            ))
+            edited.cooking_time = 7
+            self.change(edited.save)
+            self.change(self.recipes[1].delete)
+            self.assert_rankings()
+        # The change log was replayed without a full rebuild.
+        rebuild.assert_not_called()
+
+
+RELATION_TABLES = tuple(
+    model._meta.db_table for model in (Favorite, Cart, TagToRecipe)
+)
+
+
+def filter_recipes(params, user):
+    return RecipeFilter(
+        QueryDict(params), queryset=Recipe.objects.all(),
+        request=SimpleNamespace(user=user),
+    ).qs
+
+
+class RecipeFilterQueryTest(RecipeDataMixin, APITestCase):
+    """Filters are semi-joins: no DISTINCT and no joined relation rows."""
+
+    def test_filters_use_exists(self):
+        user = self.users[0]
+        params = ('is_favorited=1&is_in_shopping_cart=1&tags=tag0&tags=tag1'
+                  f'&author={user.id}')
+        sql = str(filter_recipes(params, user).query)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertEqual(sql.count('EXISTS'), 3)
+        for table in RELATION_TABLES:
+            self.assertIsNone(re.search(rf'JOIN "?{table}"?', sql), table)
+
+
+class RankingTest(RecipeDataMixin, APITestCase):
+
+    def test_every_recipe_ranked(self):
+        top = self.recipes[0]
+        RecipeScore.objects.filter(recipe=top).update(popularity=5)
+        response = self.client.get('/api/recipes/?ordering=popular&limit=20')
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids[0], top.id)
+        self.assertEqual(sorted(ids), sorted(r.id for r in self.recipes))
+
+    def test_score_joined_inner(self):
+        sql = str(filter_recipes('ordering=trending', None).query)
+        self.assertIn(f'INNER JOIN "{RecipeScore._meta.db_table}"', sql)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class RecipeFilterPlanTest(TransactionTestCase):
+    """The list filters and rankings are served by their indexes."""
+
+    def setUp(self):
+        authors = User.objects.bulk_create([
+            User(username=f'author{number}',
+                 email=f'author{number}@example.com')
+            for number in range(20)
+        ])
+        self.user = authors[0]
+        tags = Tag.objects.bulk_create([
+            Tag(name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}')
+            for number in range(5)
+        ])
+        recipes = Recipe.objects.bulk_create([
+            Recipe(name=f'Рецепт {number}', text=f'Описание {number}',
+                   cooking_time=1, author=authors[number % len(authors)])
+            for number in range(2000)
+        ])
+        TagToRecipe.objects.bulk_create([
+            TagToRecipe(recipe=recipe, tag=tags[number % len(tags)])
+            for number, recipe in enumerate(recipes)
+        ])
+        for model in (Favorite, Cart):
+            model.objects.bulk_create([
+                model(user=user, recipe=recipe)
+                for user in authors
+                for recipe in recipes[user.id % 7::40]
+            ])
+        RecipeScore.objects.bulk_create([
+            RecipeScore(recipe=recipe, popularity=number % 97,
+                        trending=number % 89)
+            for number, recipe in enumerate(recipes)
+        ])
+        with connection.cursor() as cursor:
+            for model in (Recipe, Favorite, Cart, TagToRecipe, RecipeScore):
+                cursor.execute(f'VACUUM ANALYZE {model._meta.db_table}')
+
+    def explain(self, params):
+        queryset = filter_recipes(params, self.user)[:20]
+        # Tiny tables are always cheaper to scan; rule that plan out to
+        # see whether an index can serve the filter at all.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def assert_plan(self, params, table, index=None):
+        plan = self.explain(params)
+        self.assertIsNone(
+            re.search(rf'Seq Scan on "?{table}"?', plan), plan
+        )
+        if index is not None:
+            self.assertIn(index, plan)
+
+    def test_is_favorited(self):
+        self.assert_plan('is_favorited=1', Favorite._meta.db_table,
+                         'favorite_user_recipe_idx')
+
+    def test_is_in_shopping_cart(self):
+        self.assert_plan('is_in_shopping_cart=1', Cart._meta.db_table,
+                         'cart_user_recipe_idx')
+
+    def test_tags(self):
+        self.assert_plan('tags=tag0&tags=tag1', TagToRecipe._meta.db_table)
+
+    def test_author(self):
+        self.assert_plan(f'author={self.user.id}', Recipe._meta.db_table,
+                         'recipe_author_pub_date_id_idx')
+
+    def test_popular(self):
+        self.assert_plan('ordering=popular', RecipeScore._meta.db_table,
+                         'score_popularity_idx')
+
+    def test_trending(self):
+        self.assert_plan('ordering=trending', RecipeScore._meta.db_table,
+                         'score_trending_idx')
@@ -0,0 +1,47 @@
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             TemporaryFileUploadHandler)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from backend.constant_values import RECIPE_IMAGE_MAX_SIZE
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = (
+        f'Image is larger than {RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)} MB'
+    )
+    default_code = 'image_too_large'
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """Abort multipart uploads as soon as a file exceeds the size limit.
+
+    Chunks are passed on unchanged to the next handler, so the file is
+    still written to disk incrementally.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        if content_length and content_length > RECIPE_IMAGE_MAX_SIZE * 2:
+            raise RequestTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > RECIPE_IMAGE_MAX_SIZE:
+            raise RequestTooLarge()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def recipe_upload_handlers(request):
+    return [
+        SizeLimitUploadHandler(request),
+        TemporaryFileUploadHandler(request),
+    ]
@@ -1,44 +1,129 @@
-import io
-
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
-from rest_framework.decorators import action, api_view
-from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import (AllowAny,
+                                        IsAuthenticated,
+                                        IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from . import serializers
 from .filter import RecipeFilter
-from .pagination import CustomPagination
+from .ingredient_search import ingredient_index
+from .pagination import FeedPagination, RankedPagination, RecipePagination
+from .response_cache import AnonymousResponseCacheMixin
+from .shopping_cart import SHOPPING_CART_RESPONSES, get_shopping_cart_rows
+from .uploads import recipe_upload_handlers
+from backend.constant_values import (INGREDIENT_SEARCH_LIMIT,
+                                     SHOPPING_CART_DEFAULT_FORMAT)
+from recipes import reference_data
+from recipes.cook_index import cook_index
+from recipes.counters import change_counter
 from recipes.models import (Tag,
                             Recipe,
                             Ingredient,
                             IngredientInRecipe,
                             Favorite,
                             Cart,)
+from recipes.recommendations import similarity_matrix
+from recipes.timeline import get_feed
+from users.models import User
+from users.serializers import get_subscribed_ids
+
+
+def parse_ingredient_ids(values):
+    """Ingredient ids from repeated or comma-separated query values."""
+    try:
+        ids = {int(value) for item in values
+               for value in item.split(',') if value}
+    except ValueError:
+        raise ValidationError({'ingredients': 'Expected ingredient ids'})
+    if not ids:
+        raise ValidationError({'ingredients': 'No ingredients provided'})
+    return ids
+
+
+class ReferenceDataListMixin:
+    """Serve list requests from process-local reference data with an ETag."""
+    reference_data = None
+
+    def list(self, request, *args, **kwargs):
+        etag = self.reference_data.etag()
+        etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags or '*' in etags:
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        response = Response(self.get_reference_rows(request))
+        response['ETag'] = etag
+        return response
+
+    def get_reference_rows(self, request):
+        return self.reference_data.get_state().rows
 
 
-class TagView(viewsets.ModelViewSet):
+class TagView(ReferenceDataListMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
     permissions = [AllowAny, ]
     pagination_class = None
+    reference_data = reference_data.tags
 
 
-class IngredientView(viewsets.ModelViewSet):
+class IngredientView(ReferenceDataListMixin, viewsets.ModelViewSet):
     queryset = Ingredient.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly, ]
     serializer_class = serializers.IngredientSerializer
-    search_fields = ['name', ]
     pagination_class = None
+    reference_data = reference_data.ingredients
 
+    def get_reference_rows(self, request):
+        name = request.query_params.get('name')
+        if name:
+            return ingredient_index.search(name, INGREDIENT_SEARCH_LIMIT)
+        return super().get_reference_rows(request)
 
-class RecipeView(viewsets.ModelViewSet):
+
+class RecipeView(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permissions = [IsAuthenticatedOrReadOnly, ]
-    filter_class = RecipeFilter
-    pagination_class = CustomPagination
+    filter_backends = [DjangoFilterBackend, ]
+    filterset_class = RecipeFilter
+    pagination_class = RecipePagination
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = recipe_upload_handlers(request)
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related(
+            'author'
+        ).defer(
+            'search_vector'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'IngredientsToRecipes',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ),
+            ),
+        )
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(Cart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+            )
+        return queryset
 
     def get_serializer_class(self):
         method = self.request.method
@@ -49,6 +134,8 @@ class RecipeView(viewsets.ModelViewSet):
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({'request': self.request})
+        if self.request.user.is_authenticated:
+            context['subscribed_ids'] = get_subscribed_ids(self.request.user)
         return context
 
     def update(self, request, *args, **kwargs):
@@ -67,44 +154,61 @@ class RecipeView(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-
-        is_favorited = self.request.query_params.get('is_favorited')
-        is_in_shopping_cart = self.request.query_params.get(
-            'is_in_shopping_cart'
+    @action(methods=['get'], detail=False,
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        queryset = get_feed(self.get_queryset(), request.user)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_ranked_response(self, ranked, fields):
+        """Paginate (recipe_id, *values) rows ranked outside the database.
+
+        The values are added to every serialized recipe under fields.
+        """
+        page = self.paginate_queryset(ranked)
+        recipes = self.get_queryset().in_bulk([row[0] for row in page])
+        page = [row for row in page if row[0] in recipes]
+        data = self.get_serializer(
+            [recipes[row[0]] for row in page], many=True
+        ).data
+        for item, row in zip(data, page):
+            item.update(zip(fields, row[1:]))
+        return self.get_paginated_response(data)
+
+    @action(methods=['get'], detail=False,
+            pagination_class=RankedPagination)
+    def cook(self, request):
+        ingredient_ids = parse_ingredient_ids(
+            request.query_params.getlist('ingredients')
+        )
+        return self.get_ranked_response(
+            cook_index.rank(ingredient_ids),
+            ('matched_count', 'missing_count'),
         )
-        tags_slugs = self.request.query_params.getlist('tags')
-        author = self.request.query_params.get('author')
-
-        if is_favorited == '1' and self.request.user.is_authenticated:
-            queryset = queryset.filter(
-                in_favorites__user=self.request.user
-            ).distinct()
-
-        if is_in_shopping_cart == '1' and self.request.user.is_authenticated:
-            queryset = queryset.filter(
-                in_cart__user=self.request.user
-            ).distinct()
-
-        if tags_slugs:
-            queryset = queryset.filter(tags__slug__in=tags_slugs).distinct()
-
-        if author == 'me':
-            author = self.request.user.id
-        elif author is str:
-            author = int(author)
 
-        if author:
-            queryset = queryset.filter(author__id=author).distinct()
+    @action(methods=['get'], detail=True,
+            pagination_class=RankedPagination)
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        return self.get_ranked_response(
+            similarity_matrix.similar(recipe.id), ('similarity',)
+        )
 
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+    @action(methods=['get'], detail=False,
+            permission_classes=[IsAuthenticated],
+            pagination_class=RankedPagination)
+    def recommended(self, request):
+        return self.get_ranked_response(
+            similarity_matrix.recommend(request.user), ('score',)
+        )
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            change_counter(User, instance.author_id, 'recipes_count', -1)
 
 
 class FavoriteView(APIView):
@@ -121,7 +225,9 @@ class FavoriteView(APIView):
             data=data, context={'request': request, 'recipe_id': recipe_id}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            change_counter(Recipe, recipe_id, 'favorites_count', 1)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(methods=['DELETE'], detail=True)
@@ -131,7 +237,9 @@ class FavoriteView(APIView):
         if not user.favorites.filter(recipe=recipe).exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        Favorite.objects.get(user=user, recipe=recipe).delete()
+        with transaction.atomic():
+            Favorite.objects.get(user=user, recipe=recipe).delete()
+            change_counter(Recipe, recipe.id, 'favorites_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -149,7 +257,9 @@ class ShoppingCartViewSet(APIView):
             context={'request': request}
         )
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            change_counter(Recipe, recipe_id, 'cart_count', 1)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(method=('delete',), detail=True)
@@ -158,45 +268,24 @@ class ShoppingCartViewSet(APIView):
         recipe = get_object_or_404(Recipe, id=recipe_id)
         if not user.cart.filter(recipe=recipe).exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        Cart.objects.get(user=user, recipe=recipe).delete()
+        with transaction.atomic():
+            Cart.objects.get(user=user, recipe=recipe).delete()
+            change_counter(Recipe, recipe.id, 'cart_count', -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 @api_view(['GET'])
+@permission_classes([IsAuthenticated])
 def shopping_cart_view(request):
-    user = request.user
-    all_carts = user.cart.all()
-
-    ingredients_list = {}
-
-    for cart_item in all_carts:
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe=cart_item.recipe
+    file_format = request.query_params.get(
+        'file_format', SHOPPING_CART_DEFAULT_FORMAT
+    )
+    make_response = SHOPPING_CART_RESPONSES.get(file_format)
+    if make_response is None:
+        return Response(
+            {'file_format': [
+                f'Supported formats: {", ".join(SHOPPING_CART_RESPONSES)}'
+            ]},
+            status=status.HTTP_400_BAD_REQUEST
         )
-
-        for ingredient in ingredients:
-            key = ingredient.ingredient.name
-            amount = ingredient.amount
-            measurement_unit = ingredient.ingredient.measurement_unit
-
-            try:
-                ingredients_list[key]['amount'] += amount
-            except KeyError:
-                ingredients_list[key] = {
-                    'M_U': measurement_unit,
-                    'amt': amount,
-                }
-
-    file_strings = []
-
-    for key, data in ingredients_list.items():
-        file_strings.append(f"{key} - {data['amt']} {data['M_U']}")
-
-    file_content = '\n'.join(file_strings).encode('utf-8')
-    file_name = 'shopping_cart.txt'
-    text_file = io.BytesIO(file_content)
-    text_file.seek(0)
-
-    response = FileResponse(text_file, content_type='text/plain')
-    response['Content-Disposition'] = f"attachment; filename='{file_name}'"
-    return response
+    return make_response(get_shopping_cart_rows(request.user))
@@ -10,9 +10,56 @@ INGREDIENT_NAME_MAX_LENGTH = 64
 INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH = 32
 INGREDIENT_MAX_AMOUNT = 32000
 INGREDIENT_MIN_AMOUNT = 1
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_IMPORT_CHUNK_SIZE = 5000
+INGREDIENT_IMPORT_READ_SIZE = 64 * 1024
 
 
 RECIPE_NAME_MAX_LENGTH = 128
+RECIPE_TRANSFER_CHUNK_SIZE = 1000
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+RECIPE_IMAGE_RENDITIONS_DIR = 'recipes/renditions/'
+RECIPE_IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_GC_MIN_AGE = 60 * 60
+RECIPE_SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_RESULTS_LIMIT = 1000
+RECIPE_SEARCH_BATCH_SIZE = 1000
+RECIPE_SEARCH_MIN_TOKEN_LENGTH = 2
+COOK_INDEX_MAX_DELTA = 500
+COOK_INDEX_CHANGE_TIMEOUT = 60 * 60
+
+
+# SHOPPING CART
+
+SHOPPING_CART_FILE_NAME = 'shopping_cart'
+SHOPPING_CART_DEFAULT_FORMAT = 'txt'
+SHOPPING_CART_CHUNK_SIZE = 500
+SHOPPING_CART_SPOOL_SIZE = 1024 * 1024
+SHOPPING_CART_PDF_TITLE = 'Список покупок'
+SHOPPING_CART_PDF_FONT_SIZE = 12
+SHOPPING_CART_PDF_MARGIN = 50
+
+
+# TIMELINE
+
+TIMELINE_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_SIZE = 100
+
+
+# PAGINATION
+
+COUNT_EXACT_THRESHOLD = 1000
+COUNT_ESTIMATE_THRESHOLD = 100000
+COUNT_CACHE_TIMEOUT = 60 * 5
+
+
+# RESPONSE CACHE
+
+RESPONSE_CACHE_TIMEOUT = 60 * 10
 
 
 # USERS
@@ -22,7 +69,30 @@ USER_FIRST_NAME_MAX_LENGTH = 64
 USER_LAST_NAME_MAX_LENGTH = 64
 USER_EMAIL_MAX_LENGTH = 64
 
+SUBSCRIPTIONS_RECIPES_LIMIT = 3
+SUBSCRIPTIONS_RECIPES_MAX = 20
+
 
 # MISC
 
 DEFAULT_TRUNCATE_LEN = 10
+
+
+# RECOMMENDATIONS
+
+RECOMMENDATION_TOP_K = 20
+RECOMMENDATION_MIN_COOCCURRENCE = 1
+RECOMMENDATION_BASKET_LIMIT = 500
+RECOMMENDATION_PROFILE_SIZE = 50
+RECOMMENDATION_BATCH_SIZE = 1000
+
+
+# RANKINGS
+
+RECIPE_POPULARITY_HALF_LIFE = 60 * 60 * 24 * 30
+RECIPE_TRENDING_HALF_LIFE = 60 * 60 * 24
+RECIPE_SCORE_WEIGHTS = {
+    'favorite': 1.0,
+    'cart': 0.5,
+}
+RECIPE_SCORE_BATCH_SIZE = 1000
@@ -43,7 +43,9 @@ class IngredientInRecipeInline(admin.TabularInline):
 
 @register(models.Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'cooking_time', 'author', 'pub_date')
+    list_display = ('name', 'cooking_time', 'author', 'pub_date',
+                    'favorites_count', 'cart_count')
+    readonly_fields = ('favorites_count', 'cart_count')
     list_filter = ('author', 'tags', 'ingredients')
     search_fields = ('name', 'author')
     date_hierarchy = 'pub_date'
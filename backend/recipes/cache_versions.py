@@ -0,0 +1,52 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+COUNT_VERSION_KEY = 'pagination_count_version'
+LIST_VERSION_KEY = 'recipe_list_response_version'
+
+
+def get_version(key):
+    return cache.get_or_set(key, uuid4().hex, None)
+
+
+def bump_version(key):
+    cache.set(key, uuid4().hex, None)
+
+
+def get_versions(*keys):
+    """Read several version tokens with a single cache round trip."""
+    versions = cache.get_many(keys)
+    return [versions[key] if key in versions else get_version(key)
+            for key in keys]
+
+
+def recipe_version_key(recipe_id):
+    return f'recipe_response_version:{recipe_id}'
+
+
+def author_version_key(author_id):
+    return f'author_response_version:{author_id}'
+
+
+def invalidate_counts():
+    transaction.on_commit(lambda: bump_version(COUNT_VERSION_KEY))
+
+
+def invalidate_recipes(*recipe_ids):
+    """Drop cached lists and the detail responses of the given recipes."""
+    def bump():
+        bump_version(LIST_VERSION_KEY)
+        for recipe_id in recipe_ids:
+            bump_version(recipe_version_key(recipe_id))
+
+    transaction.on_commit(bump)
+
+
+def invalidate_author(author_id):
+    def bump():
+        bump_version(LIST_VERSION_KEY)
+        bump_version(author_version_key(author_id))
+
+    transaction.on_commit(bump)
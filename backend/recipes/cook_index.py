@@ -0,0 +1,246 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.constant_values import (COOK_INDEX_CHANGE_TIMEOUT,
+                                     COOK_INDEX_MAX_DELTA)
+from recipes.models import IngredientInRecipe, Recipe
+
+SEQUENCE_KEY = 'cook_index_sequence'
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def change_key(sequence):
+    return f'cook_index_change:{sequence}'
+
+
+def next_sequence():
+    if cache.add(SEQUENCE_KEY, 1, None):
+        return 1
+    try:
+        return cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.set(SEQUENCE_KEY, 1, None)
+        return 1
+
+
+def record_change(recipe_id):
+    """Log a changed recipe so every process can patch its index."""
+    def log():
+        cache.set(change_key(next_sequence()), recipe_id,
+                  COOK_INDEX_CHANGE_TIMEOUT)
+
+    transaction.on_commit(log)
+
+
+def invalidate():
+    """Force a full rebuild, for writes that bypass signals."""
+    next_sequence()
+
+
+def build_mask(slots, size):
+    bits = bytearray(size // 8 + 1)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def iter_slots(mask):
+    """Positions of the set bits of mask, lowest first."""
+    bits = bin(mask)
+    position = bits.rfind('1')
+    while position > 1:
+        yield len(bits) - 1 - position
+        position = bits.rfind('1', 0, position)
+
+
+class CookIndex:
+    """In-process bitsets mapping ingredients to the recipes using them.
+
+    Every recipe owns a bit slot; each ingredient and each recipe size
+    (number of ingredients) has an integer bitmask over the slots.
+    Processes follow a change log kept in the shared cache: small gaps are
+    patched by reloading only the changed recipes, anything else (an
+    evicted entry, a reset sequence) triggers a full rebuild.
+    """
+
+    def __init__(self):
+        self.sequence = None
+        self.slots = {}
+        self.recipes = []
+        self.free_slots = []
+        self.masks = {}
+        self.size_masks = {}
+
+    def _load(self, recipe_ids=None):
+        times = Recipe.objects.all()
+        rows = IngredientInRecipe.objects.all()
+        if recipe_ids is not None:
+            times = times.filter(id__in=recipe_ids)
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in rows.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator():
+            ingredients[recipe_id].add(ingredient_id)
+        return {
+            recipe_id: (frozenset(ingredients[recipe_id]), cooking_time)
+            for recipe_id, cooking_time in times.values_list(
+                'id', 'cooking_time'
+            ).iterator()
+        }
+
+    def _rebuild(self, sequence):
+        loaded = self._load()
+        self.slots = {}
+        self.recipes = []
+        self.free_slots = []
+        postings = defaultdict(list)
+        sizes = defaultdict(list)
+        for slot, (recipe_id, (ingredients, cooking_time)) in enumerate(
+            loaded.items()
+        ):
+            self.slots[recipe_id] = slot
+            self.recipes.append((recipe_id, ingredients, cooking_time))
+            sizes[len(ingredients)].append(slot)
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(slot)
+        total = len(self.recipes)
+        self.masks = {ingredient_id: build_mask(slots, total)
+                      for ingredient_id, slots in postings.items()}
+        self.size_masks = {size: build_mask(slots, total)
+                           for size, slots in sizes.items()}
+        self.sequence = sequence
+
+    def _toggle(self, slot, ingredients):
+        bit = 1 << slot
+        for ingredient_id in ingredients:
+            self.masks[ingredient_id] = self.masks.get(ingredient_id, 0) ^ bit
+        size = len(ingredients)
+        self.size_masks[size] = self.size_masks.get(size, 0) ^ bit
+
+    def _patch(self, recipe_ids, sequence):
+        loaded = self._load(recipe_ids)
+        for recipe_id in recipe_ids:
+            slot = self.slots.pop(recipe_id, None)
+            if slot is not None:
+                self._toggle(slot, self.recipes[slot][1])
+                self.recipes[slot] = None
+                self.free_slots.append(slot)
+            if recipe_id not in loaded:
+                continue
+            ingredients, cooking_time = loaded[recipe_id]
+            if self.free_slots:
+                slot = self.free_slots.pop()
+                self.recipes[slot] = (recipe_id, ingredients, cooking_time)
+            else:
+                slot = len(self.recipes)
+                self.recipes.append((recipe_id, ingredients, cooking_time))
+            self.slots[recipe_id] = slot
+            self._toggle(slot, ingredients)
+        self.sequence = sequence
+
+    def refresh(self):
+        sequence = cache.get(SEQUENCE_KEY, 0)
+        if sequence == self.sequence:
+            return
+        delta = sequence - (self.sequence or 0)
+        if self.sequence is None or not 0 < delta <= COOK_INDEX_MAX_DELTA:
+            self._rebuild(sequence)
+            return
+        keys = [change_key(number)
+                for number in range(self.sequence + 1, sequence + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            self._rebuild(sequence)
+        else:
+            self._patch(set(changes.values()), sequence)
+
+    def rank(self, ingredient_ids):
+        self.refresh()
+        return CookRanking(self, ingredient_ids)
+
+
+class CookRanking:
+    """Lazily sliced ranking of recipes by available ingredients.
+
+    Recipes are ordered by the share of their ingredients available, then
+    by missing count, then by cooking time. Per-recipe match counts are
+    summed as bit planes, so only the requested slice is materialized;
+    items are (recipe_id, matched, missing) tuples.
+    """
+
+    def __init__(self, index, ingredient_ids):
+        self.index = index
+        self.planes = []
+        self.any = 0
+        for ingredient_id in set(ingredient_ids):
+            carry = index.masks.get(ingredient_id, 0)
+            self.any |= carry
+            for number, plane in enumerate(self.planes):
+                self.planes[number], carry = plane ^ carry, plane & carry
+                if not carry:
+                    break
+            if carry:
+                self.planes.append(carry)
+        # Ranks are (coverage, missing) pairs; only full coverage is shared
+        # by several (matched, size) combinations.
+        ranks = defaultdict(list)
+        for size in index.size_masks:
+            for matched in range(1, min(size, len(ingredient_ids)) + 1):
+                ranks[(-matched / size, size - matched)].append(
+                    (matched, size)
+                )
+        self.ranks = sorted(ranks.items())
+        self.exact = {}
+
+    def __len__(self):
+        return popcount(self.any)
+
+    def matched_exactly(self, matched):
+        if matched not in self.exact:
+            mask = self.any
+            for number, plane in enumerate(self.planes):
+                mask &= plane if matched >> number & 1 else ~plane
+            if matched >> len(self.planes):
+                mask = 0
+            self.exact[matched] = mask
+        return self.exact[matched]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop, _ = key.indices(len(self))
+        recipes = self.index.recipes
+        position = 0
+        results = []
+        for (_, missing), groups in self.ranks:
+            if position >= stop:
+                break
+            mask = 0
+            for matched, size in groups:
+                mask |= (self.matched_exactly(matched)
+                         & self.index.size_masks[size])
+            if not mask:
+                continue
+            count = popcount(mask)
+            if position + count > start:
+                members = sorted(
+                    (recipes[slot][2], recipes[slot][0], len(recipes[slot][1]))
+                    for slot in iter_slots(mask)
+                )
+                results.extend(
+                    (recipe_id, size - missing, missing)
+                    for _, recipe_id, size in members[
+                        max(start - position, 0):stop - position
+                    ]
+                )
+            position += count
+        return results
+
+
+cook_index = CookIndex()
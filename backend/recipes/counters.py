@@ -0,0 +1,46 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def change_counter(model, pk, field, delta):
+    """Atomically shift a denormalized counter column by delta."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def reconcile_counter(queryset, field, related_queryset, related_field):
+    """Recompute a counter from its source rows where it has drifted."""
+    actual = Coalesce(Subquery(
+        related_queryset.filter(
+            **{related_field: OuterRef('pk')}
+        ).order_by().values(related_field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), Value(0))
+    drifted = queryset.annotate(actual=actual).exclude(
+        **{field: F('actual')}
+    ).values('pk')
+    return queryset.filter(pk__in=drifted).update(**{field: actual})
+
+
+def reconcile_counters(recipe_model, user_model, favorite_model, cart_model,
+                       follow_model):
+    recipes = recipe_model.objects.all()
+    users = user_model.objects.all()
+    return {
+        'favorites_count': reconcile_counter(
+            recipes, 'favorites_count', favorite_model.objects.all(), 'recipe'
+        ),
+        'cart_count': reconcile_counter(
+            recipes, 'cart_count', cart_model.objects.all(), 'recipe'
+        ),
+        'recipes_count': reconcile_counter(
+            users, 'recipes_count', recipe_model.objects.all(), 'author'
+        ),
+        'followers_count': reconcile_counter(
+            users, 'followers_count', follow_model.objects.all(),
+            'subcribed_to'
+        ),
+    }
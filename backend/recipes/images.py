@@ -0,0 +1,138 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from backend.constant_values import (RECIPE_IMAGE_RENDITIONS,
+                                     RECIPE_IMAGE_RENDITIONS_DIR)
+from recipes.cache_versions import invalidate_recipes
+from recipes.models import Recipe
+from recipes.storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """Lazily started pool of spawned workers that render images."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_RENDITION_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def reset_executor():
+    """Drop a pool whose worker died so the next submit starts a new one."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def generate_renditions(recipe_id, image_name, force=False):
+    image_format = settings.IMAGE_RENDITION_FORMAT.upper()
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+
+    # Images are content addressed, so renditions named after the original
+    # are shared by every recipe using the same image.
+    paths = {
+        name: f'{RECIPE_IMAGE_RENDITIONS_DIR}{stem}_{name}.{extension}'
+        for name in RECIPE_IMAGE_RENDITIONS
+    }
+    missing = [name for name, path in paths.items()
+               if force or not default_storage.exists(path)]
+
+    if missing:
+        with image_storage.open(image_name, 'rb') as file:
+            original = ImageOps.exif_transpose(Image.open(file))
+            if image_format == 'JPEG' and original.mode != 'RGB':
+                original = original.convert('RGB')
+
+            for name in missing:
+                size = RECIPE_IMAGE_RENDITIONS[name]
+                image = original.copy()
+                image.thumbnail((size, size))
+                buffer = BytesIO()
+                image.save(buffer, format=image_format)
+                if force:
+                    default_storage.delete(paths[name])
+                paths[name] = default_storage.save(
+                    paths[name], ContentFile(buffer.getvalue())
+                )
+
+    if Recipe.objects.filter(
+        pk=recipe_id, image=image_name
+    ).update(image_renditions=paths):
+        invalidate_recipes(recipe_id)
+    return paths
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Image rendition failed', exc_info=error)
+        if isinstance(error, BrokenProcessPool):
+            reset_executor()
+
+
+def schedule_renditions(recipe):
+    """Render the recipe image in the background once the write commits.
+
+    With IMAGE_RENDITION_WORKERS set to 0 the renditions are generated
+    inline, which keeps tests and management commands synchronous.
+    """
+    if not recipe.image:
+        return
+    recipe_id, image_name = recipe.pk, recipe.image.name
+
+    def submit():
+        if not settings.IMAGE_RENDITION_WORKERS:
+            generate_renditions(recipe_id, image_name)
+            return
+        # The recipe is already committed: a dead pool must not turn the
+        # response into an error. The original image is served until
+        # generate_renditions catches up.
+        try:
+            future = get_executor().submit(
+                generate_renditions, recipe_id, image_name
+            )
+        except RuntimeError:
+            logger.exception('Image rendition pool is broken, restarting')
+            reset_executor()
+            try:
+                future = get_executor().submit(
+                    generate_renditions, recipe_id, image_name
+                )
+            except RuntimeError:
+                logger.exception('Image rendition not scheduled')
+                return
+        future.add_done_callback(_log_failure)
+
+    transaction.on_commit(submit)
+
+
+def rendition_urls(recipe, request=None):
+    """Rendition URLs, falling back to the original until they are ready."""
+    if not recipe.image:
+        return None
+    urls = {}
+    for name in RECIPE_IMAGE_RENDITIONS:
+        path = recipe.image_renditions.get(name)
+        url = default_storage.url(path) if path else recipe.image.url
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
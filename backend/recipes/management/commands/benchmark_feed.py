@@ -0,0 +1,83 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.timeline import fan_out_recipe, get_feed, rebuild_timelines
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = ('Compare pull (join on Follow) and push (materialized timeline) '
+            'feeds on synthetic data; all changes are rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=20,
+                            help='Recipes per author')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def timed(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            timings.append((perf_counter() - start) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2], timings[-1]
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(**options)
+            transaction.set_rollback(True)
+
+    def run(self, followers, authors, recipes, page_size, repeat, **options):
+        User.objects.bulk_create(
+            User(username=f'bench_{i}', email=f'bench_{i}@example.com')
+            for i in range(followers + authors)
+        )
+        bench_users = User.objects.filter(username__startswith='bench_')
+        users = list(bench_users.values_list('id', flat=True))
+        author_ids, follower_ids = users[:authors], users[authors:]
+
+        Recipe.objects.bulk_create(
+            Recipe(name=f'bench {author_id} {i}',
+                   text=f'bench {author_id} {i}',
+                   cooking_time=1, author_id=author_id)
+            for author_id in author_ids for i in range(recipes)
+        )
+        Follow.objects.bulk_create(
+            [Follow(subscriber_id=follower_id, subcribed_to_id=author_id)
+             for author_id in author_ids[:1] for follower_id in follower_ids]
+            + [Follow(subscriber_id=follower_ids[0],
+                      subcribed_to_id=author_id)
+               for author_id in author_ids[1:]],
+            batch_size=1000,
+        )
+        # Only the synthetic timelines: real rows stay untouched.
+        rebuild_timelines(bench_users.values('id'))
+
+        reader = User.objects.get(id=follower_ids[0])
+        for name, fan_out in (('pull', False), ('push', True)):
+            median, worst = self.timed(
+                lambda: list(get_feed(
+                    Recipe.objects.all(), reader, fan_out
+                ).order_by('-feed_date', '-id')[:page_size]),
+                repeat
+            )
+            self.stdout.write(
+                f'{name} read: median {median:.2f} ms, max {worst:.2f} ms'
+            )
+
+        recipe = Recipe.objects.create(
+            name='bench new', text='bench new', cooking_time=1,
+            author_id=author_ids[0]
+        )
+        median, worst = self.timed(lambda: fan_out_recipe(recipe), 3)
+        self.stdout.write(
+            f'push write ({len(follower_ids)} followers): '
+            f'median {median:.2f} ms, max {worst:.2f} ms'
+        )
@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from backend.constant_values import (IMAGE_GC_MIN_AGE,
+                                     RECIPE_IMAGE_RENDITIONS_DIR,
+                                     RECIPE_TRANSFER_CHUNK_SIZE)
+from recipes.models import Recipe
+from recipes.storage import image_storage
+
+
+def referenced_files():
+    """Image and rendition paths referenced by recipes, with refcounts."""
+    references = {}
+    for image, renditions in Recipe.objects.exclude(
+        image=''
+    ).exclude(image=None).values_list(
+        'image', 'image_renditions'
+    ).iterator(chunk_size=RECIPE_TRANSFER_CHUNK_SIZE):
+        for name in (image, *renditions.values()):
+            references[name] = references.get(name, 0) + 1
+    return references
+
+
+def iter_files(storage, directory):
+    """Walk a storage directory yielding (name, path) without listing it."""
+    root = storage.path(directory)
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            name = os.path.relpath(path, storage.location)
+            yield name.replace(os.sep, '/'), path
+
+
+class Command(BaseCommand):
+    help = 'Delete recipe images and renditions no recipe references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument(
+            '--min-age', type=int, default=IMAGE_GC_MIN_AGE,
+            help='Keep files modified less than this many seconds ago'
+        )
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        references = referenced_files()
+        cutoff = time.time() - options['min_age']
+
+        kept = deleted = freed = 0
+        for storage, directory in (
+            (image_storage, field.upload_to),
+            (default_storage, RECIPE_IMAGE_RENDITIONS_DIR),
+        ):
+            for name, path in iter_files(storage, directory):
+                stat = os.stat(path)
+                if name in references or stat.st_mtime > cutoff:
+                    kept += 1
+                    continue
+                if not options['dry_run']:
+                    storage.delete(name)
+                deleted += 1
+                freed += stat.st_size
+
+        shared = sum(1 for count in references.values() if count > 1)
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: {deleted} ({freed // 1024} KB), kept: {kept}, '
+            f'shared by several recipes: {shared}'
+        ))
@@ -1,33 +1,186 @@
 import csv
-from django.core.management.base import BaseCommand
+import io
+import json
+import re
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from backend.constant_values import (INGREDIENT_IMPORT_CHUNK_SIZE,
+                                     INGREDIENT_IMPORT_READ_SIZE)
 from recipes.models import Ingredient
+from recipes.reference_data import ingredients
+
+CSV_HEADER = ['name', 'measurement_unit']
+WHITESPACE_RE = re.compile(r'\s*')
+SEPARATOR_RE = re.compile(r'[\s,]*')
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row == CSV_HEADER or not row:
+            continue
+        name, measurement_unit = row
+        yield name, measurement_unit
+
+
+def read_json(file):
+    """Stream objects from a top-level JSON array without loading it."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    offset = 0
+    started = False
+    while True:
+        chunk = file.read(INGREDIENT_IMPORT_READ_SIZE)
+        buffer += chunk
+        index = WHITESPACE_RE.match(buffer).end()
+        if not started:
+            if index == len(buffer):
+                if not chunk:
+                    return
+                continue
+            if buffer[index] != '[':
+                raise CommandError('JSON file must contain an array')
+            index += 1
+            started = True
+
+        while True:
+            index = SEPARATOR_RE.match(buffer, index).end()
+            if buffer.startswith(']', index):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, index)
+            except ValueError as error:
+                if not chunk and index == len(buffer):
+                    raise CommandError('Unexpected end of JSON file')
+                # An item still undecodable with a whole read after its
+                # start is malformed rather than cut at the chunk end.
+                truncated = (chunk and len(buffer) - index
+                             <= INGREDIENT_IMPORT_READ_SIZE)
+                if truncated:
+                    break
+                raise CommandError(
+                    f'Invalid JSON at character {offset + error.pos}: '
+                    f'{error.msg}'
+                )
+            try:
+                row = item['name'], item['measurement_unit']
+            except (KeyError, TypeError):
+                raise CommandError(
+                    f'Ingredient at character {offset + index} must have '
+                    'name and measurement_unit'
+                )
+            index = end
+            yield row
+
+        # Trim what was decoded once per chunk, not after every item.
+        offset += index
+        buffer = buffer[index:]
+
+
+class CopyStream(io.TextIOBase):
+    """File-like CSV view over a row iterator, consumed by COPY."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = ''
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        while size < 0 or len(self.buffer) < size:
+            batch = list(islice(self.rows, INGREDIENT_IMPORT_CHUNK_SIZE))
+            if not batch:
+                break
+            writer.writerows(batch)
+            self.count += len(batch)
+            self.buffer += output.getvalue()
+            output.seek(0)
+            output.truncate()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
 
 
 class Command(BaseCommand):
-    help = 'Import ingredients from a CSV file'
+    help = 'Import ingredients from a CSV or JSON file'
 
     def add_arguments(self, parser):
-        parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('path', type=str,
+                            help='Path to the CSV or JSON file')
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='File format, detected from the extension by default'
+        )
+        parser.add_argument(
+            '--method', choices=('auto', 'copy', 'bulk'), default='auto',
+            help='COPY into a staging table (PostgreSQL) or bulk_create'
+        )
 
     def handle(self, *args, **options):
-        csv_file = options['csv_file']
+        path = options['path']
+        file_format = options['format'] or (
+            'json' if path.endswith('.json') else 'csv'
+        )
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('COPY import requires PostgreSQL')
 
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file)
-            next(csv_reader)  # Skip the header row
+        reader = read_json if file_format == 'json' else read_csv
+        with open(path, 'r', encoding='utf-8') as file:
+            with transaction.atomic():
+                if method == 'copy':
+                    total, created = self.copy_import(reader(file))
+                else:
+                    total, created = self.bulk_import(reader(file))
 
-            for row in csv_reader:
-                name, measurement_unit = row
-                ingredient, created = Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit
-                )
+        ingredients.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created: {created}, skipped: {total - created}')
+        )
 
-                if created:
-                    self.stdout.write(self.style.SUCCESS(
-                        f'Created: {ingredient.name}')
-                    )
-                else:
-                    self.stdout.write(self.style.SUCCESS(
-                        f'Already exists: {ingredient.name}')
-                    )
+    def bulk_import(self, rows):
+        before = Ingredient.objects.count()
+        total = 0
+        while True:
+            batch = list(islice(rows, INGREDIENT_IMPORT_CHUNK_SIZE))
+            if not batch:
+                break
+            total += len(batch)
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in batch],
+                ignore_conflicts=True,
+            )
+        return total, Ingredient.objects.count() - before
+
+    def copy_import(self, rows):
+        table = Ingredient._meta.db_table
+        stream = CopyStream(rows)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                stream,
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT ON CONSTRAINT unique_name_measurement_unit '
+                'DO NOTHING'
+            )
+            created = cursor.rowcount
+        return stream.count, created
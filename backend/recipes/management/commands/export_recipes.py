@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+
+from backend.constant_values import RECIPE_TRANSFER_CHUNK_SIZE
+from recipes.models import Recipe
+
+
+def iter_recipes(chunk_size):
+    """Yield recipes in primary key order, prefetching one chunk at a time."""
+    last_id = 0
+    while True:
+        chunk = list(
+            Recipe.objects.filter(
+                id__gt=last_id
+            ).order_by('id').select_related(
+                'author'
+            ).prefetch_related(
+                'tags',
+                'IngredientsToRecipes__ingredient',
+            )[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1].id
+
+
+def serialize_recipe(recipe):
+    return {
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'author': {
+            'username': recipe.author.username,
+            'email': recipe.author.email,
+            'first_name': recipe.author.first_name,
+            'last_name': recipe.author.last_name,
+        },
+        'image': (os.path.basename(recipe.image.name)
+                  if recipe.image else None),
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': row.ingredient.name,
+                'measurement_unit': row.ingredient.measurement_unit,
+                'amount': row.amount,
+            }
+            for row in recipe.IngredientsToRecipes.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Export recipes as NDJSON plus an image directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', type=str)
+        parser.add_argument('--chunk-size', type=int,
+                            default=RECIPE_TRANSFER_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        images_dir = os.path.join(output_dir, 'images')
+        os.makedirs(images_dir, exist_ok=True)
+
+        exported = 0
+        with open(os.path.join(output_dir, 'recipes.ndjson'), 'w',
+                  encoding='utf-8') as file:
+            for recipe in iter_recipes(options['chunk_size']):
+                data = serialize_recipe(recipe)
+                if data['image'] and recipe.image.storage.exists(
+                    recipe.image.name
+                ):
+                    with recipe.image.open('rb') as source, open(
+                        os.path.join(images_dir, data['image']), 'wb'
+                    ) as target:
+                        shutil.copyfileobj(source, target)
+                file.write(json.dumps(data, ensure_ascii=False) + '\n')
+                exported += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Exported: {exported}'))
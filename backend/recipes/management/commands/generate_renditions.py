@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate resized image renditions for recipes missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate renditions for every recipe')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.filter(image_renditions={})
+
+        generated = 0
+        rendered = set()
+        for recipe_id, image_name in recipes.values_list(
+            'id', 'image'
+        ).iterator():
+            # Renditions are shared by recipes with the same image, so each
+            # image is only redrawn once per run.
+            force = options['all'] and image_name not in rendered
+            generate_renditions(recipe_id, image_name, force=force)
+            rendered.add(image_name)
+            generated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Generated: {generated}'))
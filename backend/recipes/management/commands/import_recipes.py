@@ -0,0 +1,284 @@
+import json
+import os
+from hashlib import sha256
+from itertools import islice
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from backend.constant_values import RECIPE_TRANSFER_CHUNK_SIZE
+from recipes import cook_index
+from recipes.cache_versions import invalidate_counts, invalidate_recipes
+from recipes.counters import reconcile_counters
+from recipes.models import (Cart,
+                            Favorite,
+                            Ingredient,
+                            IngredientInRecipe,
+                            Recipe,
+                            RecipeScore,
+                            Tag,
+                            TagToRecipe)
+from recipes.reference_data import ingredients as ingredients_reference
+from recipes.scores import update_recipe_scores
+from recipes.search import rebuild_search_index
+from recipes.timeline import rebuild_timelines
+from users.models import Follow, User
+
+# Id mappings shared with worker processes by the pool initializer.
+MAPPINGS = {}
+
+
+def read_lines(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        yield from (line for line in file if line.strip())
+
+
+def read_chunks(path, chunk_size, skip=()):
+    lines = (line for number, line in enumerate(read_lines(path))
+             if number not in skip)
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def collect_references(path):
+    """Single streaming pass collecting the distinct referenced keys.
+
+    Also returns the numbers of lines repeating an earlier (author, text)
+    pair, so that parallel chunks never insert the same recipe twice.
+    """
+    authors, tags, ingredients = {}, set(), set()
+    seen, duplicates = set(), set()
+    for number, line in enumerate(read_lines(path)):
+        data = json.loads(line)
+        username = data['author']['username']
+        key = (username, sha256(data['text'].encode()).digest())
+        if key in seen:
+            duplicates.add(number)
+            continue
+        seen.add(key)
+        authors.setdefault(username, data['author'])
+        tags.update(data['tags'])
+        ingredients.update(
+            (item['name'], item['measurement_unit'])
+            for item in data['ingredients']
+        )
+    return authors, tags, ingredients, duplicates
+
+
+def resolve_mappings(authors, tags, ingredients):
+    """Create missing authors and ingredients, then map keys to ids."""
+    existing = set(User.objects.filter(
+        username__in=authors
+    ).values_list('username', flat=True))
+    User.objects.bulk_create(
+        [User(password=make_password(None), **author)
+         for username, author in authors.items()
+         if username not in existing],
+        ignore_conflicts=True,
+    )
+    Ingredient.objects.bulk_create(
+        [Ingredient(name=name, measurement_unit=measurement_unit)
+         for name, measurement_unit in ingredients],
+        ignore_conflicts=True,
+    )
+    ingredients_reference.invalidate()
+    return {
+        'authors': dict(User.objects.filter(
+            username__in=authors
+        ).values_list('username', 'id')),
+        'tags': dict(Tag.objects.filter(
+            slug__in=tags
+        ).values_list('slug', 'id')),
+        'ingredients': {
+            (name, measurement_unit): pk
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+            if (name, measurement_unit) in ingredients
+        },
+    }
+
+
+def init_worker(mappings):
+    MAPPINGS.update(mappings)
+    connections.close_all()
+
+
+def import_image(images_dir, name):
+    if not name:
+        return None
+    path = os.path.join(images_dir, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file:
+        field = Recipe._meta.get_field('image')
+        return field.storage.save(
+            field.generate_filename(None, name), File(file)
+        )
+
+
+def attach_images(recipes, new_items, images_dir):
+    with_images = []
+    for recipe, (_, item) in zip(recipes, new_items):
+        recipe.image = import_image(images_dir, item['image'])
+        if recipe.image:
+            with_images.append(recipe)
+    Recipe.objects.bulk_update(with_images, ['image'])
+
+
+def insert_recipes(new_items, images_dir):
+    """Insert recipes with their relations; images follow the commit."""
+    tags = MAPPINGS['tags']
+    ingredients = MAPPINGS['ingredients']
+
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            author_id=key[0],
+            name=item['name'],
+            text=item['text'],
+            cooking_time=item['cooking_time'],
+        )
+        for key, item in new_items
+    ])
+    if recipes and recipes[0].pk is None:
+        ids = {
+            (author_id, text): pk
+            for pk, author_id, text in Recipe.objects.filter(
+                author_id__in={key[0] for key, _ in new_items},
+                text__in={key[1] for key, _ in new_items},
+            ).values_list('id', 'author_id', 'text')
+        }
+        for recipe, (key, _) in zip(recipes, new_items):
+            recipe.pk = ids[key]
+
+    for recipe, (_, item) in zip(recipes, new_items):
+        recipe.pub_date = parse_datetime(item['pub_date'])
+    Recipe.objects.bulk_update(recipes, ['pub_date'])
+
+    IngredientInRecipe.objects.bulk_create([
+        IngredientInRecipe(
+            recipe=recipe,
+            ingredient_id=ingredients[
+                (row['name'], row['measurement_unit'])
+            ],
+            amount=row['amount'],
+        )
+        for recipe, (_, item) in zip(recipes, new_items)
+        for row in item['ingredients']
+    ])
+    TagToRecipe.objects.bulk_create([
+        TagToRecipe(recipe=recipe, tag_id=tags[slug])
+        for recipe, (_, item) in zip(recipes, new_items)
+        for slug in item['tags'] if slug in tags
+    ], ignore_conflicts=True)
+    RecipeScore.objects.bulk_create(
+        [RecipeScore(recipe=recipe) for recipe in recipes]
+    )
+
+    # Files are only written for committed recipes, so a rolled back
+    # chunk leaves no orphan images behind.
+    transaction.on_commit(
+        lambda: attach_images(recipes, new_items, images_dir)
+    )
+    return recipes
+
+
+def import_chunk(args):
+    lines, images_dir = args
+    authors = MAPPINGS['authors']
+
+    items = [json.loads(line) for line in lines]
+    keys = {(authors[item['author']['username']], item['text'])
+            for item in items}
+    existing = set(Recipe.objects.filter(
+        author_id__in={author_id for author_id, _ in keys},
+        text__in={text for _, text in keys},
+    ).values_list('author_id', 'text'))
+    new_items = []
+    for item in items:
+        key = (authors[item['author']['username']], item['text'])
+        if key not in existing:
+            existing.add(key)
+            new_items.append((key, item))
+
+    try:
+        with transaction.atomic():
+            recipes = insert_recipes(new_items, images_dir)
+        return len(items), len(recipes), []
+    except IntegrityError:
+        pass
+
+    # A recipe was created concurrently: retry row by row to find it.
+    created, conflicts = 0, []
+    for key, item in new_items:
+        try:
+            with transaction.atomic():
+                created += len(insert_recipes([(key, item)], images_dir))
+        except IntegrityError:
+            conflicts.append((item['author']['username'], item['name']))
+    return len(items), created, conflicts
+
+
+class Command(BaseCommand):
+    help = 'Import recipes exported by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input_dir', type=str)
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--chunk-size', type=int,
+                            default=RECIPE_TRANSFER_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        input_dir = options['input_dir']
+        path = os.path.join(input_dir, 'recipes.ndjson')
+        images_dir = os.path.join(input_dir, 'images')
+
+        authors, tags, ingredients, duplicates = collect_references(path)
+        mappings = resolve_mappings(authors, tags, ingredients)
+        tasks = (
+            (chunk, images_dir)
+            for chunk in read_chunks(path, options['chunk_size'], duplicates)
+        )
+
+        total, created, conflicts = len(duplicates), 0, []
+        if options['workers'] > 1:
+            connections.close_all()
+            with Pool(options['workers'], init_worker, (mappings,)) as pool:
+                results = pool.imap_unordered(import_chunk, tasks)
+                for read, inserted, chunk_conflicts in results:
+                    total += read
+                    created += inserted
+                    conflicts.extend(chunk_conflicts)
+        else:
+            MAPPINGS.update(mappings)
+            for task in tasks:
+                read, inserted, chunk_conflicts = import_chunk(task)
+                total += read
+                created += inserted
+                conflicts.extend(chunk_conflicts)
+
+        reconcile_counters(Recipe, User, Favorite, Cart, Follow)
+        invalidate_counts()
+        invalidate_recipes()
+        rebuild_search_index(missing_only=True)
+        cook_index.invalidate()
+        update_recipe_scores(full=True)
+        if settings.RECIPE_FEED_FANOUT:
+            rebuild_timelines()
+
+        for username, name in conflicts:
+            self.stderr.write(f'Conflict: recipe "{name}" by {username} '
+                              'was created concurrently')
+        skipped = total - created - len(conflicts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created: {created}, skipped: {skipped}, '
+            f'conflicts: {len(conflicts)}'
+        ))
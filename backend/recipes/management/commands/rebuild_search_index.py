@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recompute recipe full-text search vectors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only index recipes without a vector')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_search_index(options['missing_only'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed: {indexed}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import TimelineEntry
+from recipes.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized subscription timelines from Follow'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_timelines()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Timeline entries: {TimelineEntry.objects.count()}')
+        )
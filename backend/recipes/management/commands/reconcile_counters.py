@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import reconcile_counters
+from recipes.models import Cart, Favorite, Recipe
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized recipe and user counters'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_counters(Recipe, User, Favorite, Cart, Follow)
+
+        for field, count in fixed.items():
+            self.stdout.write(self.style.SUCCESS(
+                f'{field}: {count} rows fixed')
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.scores import update_recipe_scores
+
+
+class Command(BaseCommand):
+    help = 'Roll favorites and shopping carts up into recipe rankings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every score, also dropping removed activity'
+        )
+
+    def handle(self, *args, **options):
+        updated = update_recipe_scores(options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Updated: {updated} recipes'))
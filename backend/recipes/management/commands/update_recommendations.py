@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import update_similarities
+
+
+class Command(BaseCommand):
+    help = 'Recompute similar recipes from favorites co-occurrence'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every recipe, also dropping removed favorites'
+        )
+
+    def handle(self, *args, **options):
+        updated = update_similarities(options['full'])
+        self.stdout.write(self.style.SUCCESS(f'Updated: {updated} recipes'))
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.9 on 2026-10-18 07:21
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The GIN index and the initial vectors only exist on PostgreSQL; other
+# databases use the in-process search index from recipes.search.
+CREATE_SEARCH_INDEX = '''
+UPDATE recipes_recipe r SET search_vector =
+    setweight(to_tsvector('russian', r.name), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(i.name, ' ')
+        FROM recipes_ingredientinrecipe ir
+        JOIN recipes_ingredient i ON i.id = ir.ingredient_id
+        WHERE ir.recipe_id = r.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', r.text), 'C');
+CREATE INDEX recipe_search_vector_idx ON recipes_recipe
+    USING gin (search_vector);
+'''
+DROP_SEARCH_INDEX = 'DROP INDEX IF EXISTS recipe_search_vector_idx;'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_relation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
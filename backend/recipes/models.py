@@ -1,8 +1,10 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 import backend.constant_values as constant_values
 from users.models import User
+from recipes.storage import image_storage
 
 
 class Tag(models.Model):
@@ -81,8 +83,16 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Изображение',
         upload_to='recipes/image/',
+        storage=image_storage,
         blank=True,
         null=True,
+        db_index=True,
+    )
+
+    image_renditions = models.JSONField(
+        verbose_name='Уменьшенные изображения',
+        default=dict,
+        editable=False,
     )
 
     author = models.ForeignKey(
@@ -110,8 +120,26 @@ class Recipe(models.Model):
         auto_now_add=True
     )
 
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+
+    cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = ('Рецепт')
         verbose_name_plural = ('Рецепты')
         constraints = [
@@ -120,6 +148,16 @@ class Recipe(models.Model):
                 name='unique_text_author'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name[:constant_values.DEFAULT_TRUNCATE_LEN]
@@ -220,6 +258,12 @@ class Favorite(models.Model):
                 name='unique_favorite_recipe_user',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'recipe'),
+                name='favorite_user_recipe_idx',
+            ),
+        )
 
     def __str__(self) -> str:
         return f'Favorite(User:{self.user}, Recipe:{self.recipe})'
@@ -259,6 +303,142 @@ class Cart(models.Model):
                 name='unique_cart_recipe_user',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'recipe'),
+                name='cart_user_recipe_idx',
+            ),
+        )
 
     def __str__(self) -> str:
         return f'Cart(User:{self.user}, Recipe:{self.recipe})'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        related_name='timeline',
+        on_delete=models.CASCADE,
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='timeline_entries',
+        on_delete=models.CASCADE,
+    )
+
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-recipe')
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_user_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'TimelineEntry(User:{self.user}, Recipe:{self.recipe})'
+
+
+class RecipeSimilarity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='similarities',
+        on_delete=models.CASCADE,
+    )
+
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+
+    score = models.FloatField(
+        verbose_name='Сходство',
+    )
+
+    computed_at = models.DateTimeField(
+        verbose_name='Дата расчёта',
+    )
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similarity_recipe_similar',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similarity_recipe_score_idx',
+            ),
+            models.Index(
+                fields=('computed_at',),
+                name='similarity_computed_at_idx',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'RecipeSimilarity({self.recipe}, {self.similar})'
+
+
+class RecipeScore(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        related_name='score',
+        primary_key=True,
+        on_delete=models.CASCADE,
+    )
+
+    popularity = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+    )
+
+    trending = models.FloatField(
+        verbose_name='Набирает популярность',
+        default=0,
+    )
+
+    computed_at = models.DateTimeField(
+        verbose_name='Дата расчёта',
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(
+                fields=('-popularity',),
+                name='score_popularity_idx',
+            ),
+            models.Index(
+                fields=('-trending',),
+                name='score_trending_idx',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'RecipeScore({self.recipe}, {self.popularity:.2f})'
@@ -0,0 +1,64 @@
+from hashlib import md5
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from backend.constant_values import (COUNT_CACHE_TIMEOUT,
+                                     COUNT_ESTIMATE_THRESHOLD,
+                                     COUNT_EXACT_THRESHOLD)
+from recipes.cache_versions import COUNT_VERSION_KEY, get_version
+
+
+def estimate_count(queryset):
+    """Planner row estimate for an unfiltered PostgreSQL table."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < COUNT_ESTIMATE_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+def get_count(queryset):
+    """Count strategy for paginated querysets.
+
+    Counts are cached until a signal bumps the count version. On a miss,
+    small result sets are counted exactly with a bounded query; larger ones
+    use the planner estimate for unfiltered tables and an exact count
+    otherwise.
+    """
+    version = get_version(COUNT_VERSION_KEY)
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    cache_key = 'pagination_count:{}'.format(
+        md5(f'{sql}{params}'.encode()).hexdigest()
+    )
+    count = cache.get(cache_key, version=version)
+    if count is not None:
+        return count
+
+    count = queryset[:COUNT_EXACT_THRESHOLD + 1].count()
+    if count > COUNT_EXACT_THRESHOLD:
+        count = estimate_count(queryset)
+        if count is None:
+            count = queryset.count()
+    cache.set(cache_key, count, COUNT_CACHE_TIMEOUT, version=version)
+    return count
+
+
+class CountStrategyPaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        return get_count(self.object_list)
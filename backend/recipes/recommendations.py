@@ -0,0 +1,187 @@
+from array import array
+from collections import Counter, defaultdict
+from heapq import nlargest
+from math import sqrt
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from recipes.cache_versions import bump_version, get_version
+from backend.constant_values import (RECOMMENDATION_BASKET_LIMIT,
+                                     RECOMMENDATION_BATCH_SIZE,
+                                     RECOMMENDATION_MIN_COOCCURRENCE,
+                                     RECOMMENDATION_PROFILE_SIZE,
+                                     RECOMMENDATION_TOP_K)
+from recipes.models import Favorite, RecipeSimilarity
+
+SIMILARITY_VERSION_KEY = 'recipe_similarity_version'
+
+
+def load_baskets(users=None):
+    """Recent favorites per user, capped so heavy users stay linear."""
+    favorites = Favorite.objects.order_by('user_id', '-date_added')
+    if users is not None:
+        favorites = favorites.filter(user__in=users)
+    baskets = defaultdict(list)
+    for user_id, recipe_id in favorites.values_list(
+        'user_id', 'recipe_id'
+    ).iterator():
+        basket = baskets[user_id]
+        if len(basket) < RECOMMENDATION_BASKET_LIMIT:
+            basket.append(recipe_id)
+    return baskets
+
+
+def compute_similarities(recipe_ids=None):
+    """Yield (recipe_id, [(similar_id, score), ...]) top-K neighbours.
+
+    Scores are cosine similarities of the recipes' favorite vectors:
+    co-occurrences divided by the geometric mean of the fan counts, both
+    taken from the favorite rows so a score never exceeds 1.
+    """
+    users = None
+    if recipe_ids is not None:
+        users = Favorite.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('user_id')
+    baskets = load_baskets(users)
+    fans = defaultdict(list)
+    for user_id, basket in baskets.items():
+        for recipe_id in basket:
+            fans[recipe_id].append(user_id)
+
+    if users is None:
+        fan_counts = {recipe_id: len(fan_ids)
+                      for recipe_id, fan_ids in fans.items()}
+    else:
+        # Only the baskets of the targets' fans are loaded, so the other
+        # fans of their neighbours are counted in the database.
+        fan_counts = dict(Favorite.objects.filter(
+            recipe_id__in=Favorite.objects.filter(
+                user__in=users
+            ).values('recipe_id')
+        ).order_by().values('recipe_id').annotate(
+            count=Count('id')
+        ).values_list('recipe_id', 'count'))
+    targets = fans if recipe_ids is None else recipe_ids
+    for recipe_id in targets:
+        cooccurrences = Counter()
+        for user_id in fans.get(recipe_id, ()):
+            cooccurrences.update(baskets[user_id])
+        cooccurrences.pop(recipe_id, None)
+        own = max(fan_counts.get(recipe_id, 0), 1)
+        yield recipe_id, nlargest(RECOMMENDATION_TOP_K, (
+            (similar_id, count / sqrt(
+                own * max(fan_counts.get(similar_id, 0), 1)
+            ))
+            for similar_id, count in cooccurrences.items()
+            if count >= RECOMMENDATION_MIN_COOCCURRENCE
+        ), key=lambda item: (item[1], -item[0]))
+
+
+def _write(batch, computed_at):
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(
+            recipe_id__in=[recipe_id for recipe_id, _ in batch]
+        ).delete()
+        RecipeSimilarity.objects.bulk_create([
+            RecipeSimilarity(recipe_id=recipe_id, similar_id=similar_id,
+                             score=score, computed_at=computed_at)
+            for recipe_id, neighbours in batch
+            for similar_id, score in neighbours
+        ])
+
+
+def update_similarities(full=False):
+    """Recompute the stored neighbours, incrementally unless full.
+
+    An incremental run only revisits recipes co-favorited by users who
+    added a favorite since the previous run. Removed favorites are only
+    accounted for by a full run.
+    """
+    started = timezone.now()
+    last_run = RecipeSimilarity.objects.aggregate(
+        last_run=Max('computed_at')
+    )['last_run']
+    recipe_ids = None
+    if not full and last_run is not None:
+        active_users = Favorite.objects.filter(
+            date_added__gt=last_run
+        ).values('user_id')
+        recipe_ids = set(Favorite.objects.filter(
+            user__in=active_users
+        ).values_list('recipe_id', flat=True))
+
+    updated = 0
+    batch = []
+    for item in compute_similarities(recipe_ids):
+        batch.append(item)
+        if len(batch) >= RECOMMENDATION_BATCH_SIZE:
+            _write(batch, started)
+            updated += len(batch)
+            batch = []
+    if batch:
+        _write(batch, started)
+        updated += len(batch)
+    if recipe_ids is None:
+        RecipeSimilarity.objects.filter(computed_at__lt=started).delete()
+
+    bump_version(SIMILARITY_VERSION_KEY)
+    return updated
+
+
+class SimilarityMatrix:
+    """Process-local CSR copy of the similarity table.
+
+    Neighbour ids and scores live in two flat arrays; each recipe maps to
+    its (start, end) range, already ordered by descending score.
+    """
+
+    def __init__(self):
+        self._state = (None, {}, array('q'), array('d'))
+
+    def _get_state(self):
+        version = get_version(SIMILARITY_VERSION_KEY)
+        if self._state[0] != version:
+            rows = {}
+            neighbours = array('q')
+            scores = array('d')
+            current, start = None, 0
+            for recipe_id, similar_id, score in (
+                RecipeSimilarity.objects.order_by(
+                    'recipe_id', '-score', 'similar_id'
+                ).values_list('recipe_id', 'similar_id', 'score').iterator()
+            ):
+                if recipe_id != current:
+                    if current is not None:
+                        rows[current] = (start, len(neighbours))
+                    current, start = recipe_id, len(neighbours)
+                neighbours.append(similar_id)
+                scores.append(score)
+            if current is not None:
+                rows[current] = (start, len(neighbours))
+            self._state = (version, rows, neighbours, scores)
+        return self._state
+
+    def similar(self, recipe_id):
+        """Most similar recipes as (recipe_id, score), best first."""
+        _, rows, neighbours, scores = self._get_state()
+        start, end = rows.get(recipe_id, (0, 0))
+        return list(zip(neighbours[start:end], scores[start:end]))
+
+    def recommend(self, user):
+        """Recipes similar to the user's recent favorites, best first."""
+        favorites = list(user.favorites.order_by(
+            '-date_added'
+        ).values_list('recipe_id', flat=True))
+        seen = set(favorites)
+        totals = defaultdict(float)
+        for recipe_id in favorites[:RECOMMENDATION_PROFILE_SIZE]:
+            for similar_id, score in self.similar(recipe_id):
+                if similar_id not in seen:
+                    totals[similar_id] += score
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+
+
+similarity_matrix = SimilarityMatrix()
@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+from django.db import transaction
+
+from recipes.cache_versions import bump_version, get_version
+from recipes.models import Ingredient, Tag
+
+ReferenceState = namedtuple('ReferenceState', ('version', 'by_id', 'rows'))
+
+
+class ReferenceData:
+    """Process-local, versioned snapshot of a small reference table.
+
+    Every worker keeps its own copy and reloads it when the version key in
+    the shared cache changes, so lookups cost no queries between changes.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.version_key = f'{model._meta.model_name}_reference_version'
+        self._state = ReferenceState(None, {}, [])
+
+    def invalidate(self):
+        """Bump the version once the current transaction commits.
+
+        Bumping earlier would let another worker reload the old rows under
+        the new version and keep serving them.
+        """
+        transaction.on_commit(lambda: bump_version(self.version_key))
+
+    def get_state(self):
+        version = get_version(self.version_key)
+        if self._state.version != version:
+            objects = list(self.model.objects.all())
+            self._state = ReferenceState(
+                version,
+                {obj.id: obj for obj in objects},
+                [{field: getattr(obj, field) for field in self.fields}
+                 for obj in objects],
+            )
+        return self._state
+
+    def get(self, pk):
+        return self.get_state().by_id.get(pk)
+
+    def in_bulk(self, ids):
+        """Resolve ids from the snapshot, confirming misses with one query."""
+        by_id = self.get_state().by_id
+        objects = {pk: by_id[pk] for pk in ids if pk in by_id}
+        missing = [pk for pk in ids if pk not in objects]
+        if missing:
+            objects.update(self.model.objects.in_bulk(missing))
+        return objects
+
+    def etag(self):
+        state = self.get_state()
+        return f'"{self.model._meta.model_name}-{state.version}"'
+
+
+tags = ReferenceData(Tag, ('id', 'name', 'color', 'slug'))
+ingredients = ReferenceData(Ingredient, ('id', 'name', 'measurement_unit'))
@@ -0,0 +1,112 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from backend.constant_values import (RECIPE_POPULARITY_HALF_LIFE,
+                                     RECIPE_SCORE_BATCH_SIZE,
+                                     RECIPE_SCORE_WEIGHTS,
+                                     RECIPE_TRENDING_HALF_LIFE)
+from recipes.cache_versions import invalidate_recipes
+from recipes.models import Cart, Favorite, Recipe, RecipeScore
+
+RANKINGS = {
+    'popular': 'score__popularity',
+    'trending': 'score__trending',
+}
+
+
+def decay(seconds, half_life):
+    return 0.5 ** (max(seconds, 0) / half_life)
+
+
+def create_missing_scores():
+    RecipeScore.objects.bulk_create(
+        [RecipeScore(recipe_id=pk) for pk in Recipe.objects.filter(
+            score__isnull=True
+        ).values_list('id', flat=True)],
+        batch_size=RECIPE_SCORE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def collect_activity(since, now):
+    """Decayed favorite and cart activity per recipe, as of now."""
+    popularity = defaultdict(float)
+    trending = defaultdict(float)
+    for model, weight in ((Favorite, RECIPE_SCORE_WEIGHTS['favorite']),
+                          (Cart, RECIPE_SCORE_WEIGHTS['cart'])):
+        events = model.objects.filter(date_added__lte=now)
+        if since is not None:
+            events = events.filter(date_added__gt=since)
+        for recipe_id, date_added in events.order_by().values_list(
+            'recipe_id', 'date_added'
+        ).iterator():
+            age = (now - date_added).total_seconds()
+            popularity[recipe_id] += weight * decay(
+                age, RECIPE_POPULARITY_HALF_LIFE
+            )
+            trending[recipe_id] += weight * decay(
+                age, RECIPE_TRENDING_HALF_LIFE
+            )
+    return popularity, trending
+
+
+def update_recipe_scores(full=False):
+    """Roll favorite and cart activity up into RecipeScore.
+
+    Exponential decay is multiplicative, so an incremental run ages every
+    stored score with one UPDATE and only adds the events since the last
+    run. Removed favorites and cart items are only accounted for by a full
+    run, which recomputes every score from the activity tables.
+    """
+    now = timezone.now()
+    create_missing_scores()
+    last_run = RecipeScore.objects.aggregate(
+        last_run=Max('computed_at')
+    )['last_run']
+    if full:
+        last_run = None
+
+    with transaction.atomic():
+        if last_run is None:
+            RecipeScore.objects.update(popularity=0, trending=0,
+                                       computed_at=now)
+        else:
+            age = (now - last_run).total_seconds()
+            RecipeScore.objects.update(
+                popularity=F('popularity') * decay(
+                    age, RECIPE_POPULARITY_HALF_LIFE
+                ),
+                trending=F('trending') * decay(
+                    age, RECIPE_TRENDING_HALF_LIFE
+                ),
+                computed_at=now,
+            )
+
+        popularity, trending = collect_activity(last_run, now)
+        recipe_ids = list(popularity)
+        for start in range(0, len(recipe_ids), RECIPE_SCORE_BATCH_SIZE):
+            batch = recipe_ids[start:start + RECIPE_SCORE_BATCH_SIZE]
+            scores = list(RecipeScore.objects.filter(recipe_id__in=batch))
+            for score in scores:
+                score.popularity += popularity[score.recipe_id]
+                score.trending += trending[score.recipe_id]
+            RecipeScore.objects.bulk_update(
+                scores, ['popularity', 'trending']
+            )
+        invalidate_recipes()
+    return len(recipe_ids)
+
+
+def order_by_ranking(queryset, ranking):
+    """Order recipes by a precomputed score, walking the score index.
+
+    Every recipe gets its score row when it is created, so the inner join
+    keeps all of them while letting the planner start from the index.
+    """
+    field = RANKINGS[ranking]
+    return queryset.filter(score__isnull=False).order_by(
+        f'-{field}', '-pub_date', '-id'
+    )
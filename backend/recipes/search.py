@@ -0,0 +1,185 @@
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from math import log
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery,
+                                           SearchRank,
+                                           SearchVector)
+from django.db import connections, transaction
+from django.db.models import (Case,
+                              F,
+                              FloatField,
+                              OuterRef,
+                              Subquery,
+                              Value,
+                              When)
+from django.db.models.functions import Coalesce
+
+from recipes.cache_versions import bump_version, get_version
+from backend.constant_values import (RECIPE_SEARCH_BATCH_SIZE,
+                                     RECIPE_SEARCH_CONFIG,
+                                     RECIPE_SEARCH_MIN_TOKEN_LENGTH,
+                                     RECIPE_SEARCH_RESULTS_LIMIT)
+from recipes.models import IngredientInRecipe, Recipe
+
+SEARCH_VERSION_KEY = 'recipe_search_version'
+
+# Recipe columns that feed the search data besides ingredient names.
+INDEXED_FIELDS = ('name', 'text')
+
+# Same relative weights PostgreSQL uses for the A, B and C labels.
+FIELD_WEIGHTS = {'name': 1.0, 'ingredients': 0.4, 'text': 0.2}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def uses_postgres(queryset=None):
+    alias = queryset.db if queryset is not None else 'default'
+    return connections[alias].vendor == 'postgresql'
+
+
+def search_vector():
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector(Coalesce(ingredient_names, Value('')),
+                       weight='B', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=RECIPE_SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Recompute stored vectors in batches, one UPDATE per batch."""
+    ids = list(queryset.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), RECIPE_SEARCH_BATCH_SIZE):
+        Recipe.objects.filter(
+            id__in=ids[start:start + RECIPE_SEARCH_BATCH_SIZE]
+        ).update(search_vector=search_vector())
+    return len(ids)
+
+
+def index_recipes(*recipe_ids):
+    """Refresh the search data of recipes once the transaction commits.
+
+    Running after commit means a new recipe is indexed together with the
+    ingredients that are bulk-created after it.
+    """
+    def refresh():
+        if uses_postgres():
+            update_search_vectors(Recipe.objects.filter(id__in=recipe_ids))
+        else:
+            bump_version(SEARCH_VERSION_KEY)
+
+    transaction.on_commit(refresh)
+
+
+def rebuild_search_index(missing_only=False):
+    if not uses_postgres():
+        bump_version(SEARCH_VERSION_KEY)
+        return Recipe.objects.count()
+    queryset = Recipe.objects.all()
+    if missing_only:
+        queryset = queryset.filter(search_vector=None)
+    return update_search_vectors(queryset)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower())
+            if len(token) >= RECIPE_SEARCH_MIN_TOKEN_LENGTH]
+
+
+class RecipeSearchIndex:
+    """In-process inverted index used where PostgreSQL search is missing.
+
+    Maps tokens to weighted postings and matches query words as prefixes,
+    standing in for stemming. Rebuilt when the search version changes.
+    """
+
+    def __init__(self):
+        self._state = (None, [], {}, 0)
+
+    def _build(self):
+        documents = defaultdict(lambda: defaultdict(list))
+        for pk, name, text in Recipe.objects.values_list(
+            'id', 'name', 'text'
+        ).iterator():
+            documents[pk]['name'].append(name)
+            documents[pk]['text'].append(text)
+        for pk, name in IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient__name'
+        ).iterator():
+            documents[pk]['ingredients'].append(name)
+
+        postings = defaultdict(dict)
+        for pk, fields in documents.items():
+            for field, values in fields.items():
+                for token in tokenize(' '.join(values)):
+                    weights = postings[token]
+                    weights[pk] = weights.get(pk, 0) + FIELD_WEIGHTS[field]
+        return sorted(postings), dict(postings), len(documents)
+
+    def _get_state(self):
+        version = get_version(SEARCH_VERSION_KEY)
+        if self._state[0] != version:
+            self._state = (version, *self._build())
+        return self._state
+
+    def search(self, query, limit):
+        """Ranked (recipe_id, score) pairs matching every query word."""
+        _, vocabulary, postings, total = self._get_state()
+        scores = None
+        for word in set(tokenize(query)):
+            matches = defaultdict(float)
+            start = bisect_left(vocabulary, word)
+            for token in vocabulary[start:]:
+                if not token.startswith(word):
+                    break
+                weights = postings[token]
+                idf = log(1 + total / len(weights))
+                for pk, weight in weights.items():
+                    matches[pk] += weight * idf
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pk: score + matches[pk]
+                          for pk, score in scores.items() if pk in matches}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit]
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, query):
+    """Filter a recipe queryset by a text query, ordered by relevance."""
+    if uses_postgres(queryset):
+        search_query = SearchQuery(
+            query, config=RECIPE_SEARCH_CONFIG, search_type='websearch'
+        )
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        )
+    else:
+        ranked = recipe_search_index.search(
+            query, RECIPE_SEARCH_RESULTS_LIMIT
+        )
+        queryset = queryset.filter(id__in=[pk for pk, _ in ranked]).annotate(
+            search_rank=Case(
+                *[When(id=pk, then=Value(score)) for pk, score in ranked],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
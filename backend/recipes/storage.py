@@ -0,0 +1,52 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage naming every file by the SHA-256 of its content.
+
+    Saving bytes that are already stored writes nothing and returns the
+    existing name, so identical images share a single blob on disk.
+    Blobs are fanned out into subdirectories by the first hash characters.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join(filter(None, (
+            os.path.dirname(name), hexdigest[:2], f'{hexdigest}{extension}'
+        )))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Refresh the blob so garbage collection treats it as new while
+            # the recipe referencing it is still being saved.
+            os.utime(self.path(name))
+            return name
+        try:
+            return self._save(name, content)
+        except FileExistsError:
+            # The same content was written concurrently.
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        if self.exists(name):
+            raise FileExistsError(name)
+        return name
+
+
+image_storage = ContentAddressedStorage()
@@ -0,0 +1,122 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from backend.constant_values import (TIMELINE_BACKFILL_SIZE,
+                                     TIMELINE_BATCH_SIZE)
+from recipes.models import Recipe, TimelineEntry
+from users.models import Follow
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_feed(queryset, user, fan_out=None):
+    """Recipes by the authors user follows, annotated with feed_date.
+
+    Reads the materialized timeline when fan-out on write is enabled and
+    joins through Follow otherwise.
+    """
+    if fan_out is None:
+        fan_out = settings.RECIPE_FEED_FANOUT
+    if fan_out:
+        return queryset.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date')
+        )
+    return queryset.filter(author__followers__subscriber=user).annotate(
+        feed_date=F('pub_date')
+    )
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe):
+    follower_ids = Follow.objects.filter(
+        subcribed_to_id=recipe.author_id
+    ).values_list('subscriber_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, recipe=recipe,
+                      pub_date=recipe.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def get_executor():
+    """Lazily started threads that write timelines off the request."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_FEED_FANOUT_WORKERS,
+        )
+    return _executor
+
+
+def _fan_out_in_thread(recipe):
+    try:
+        fan_out_recipe(recipe)
+    finally:
+        connection.close()
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.error('Timeline fan-out failed', exc_info=future.exception())
+
+
+def schedule_fan_out(recipe):
+    """Fan a new recipe out once the write commits.
+
+    The follower timelines are written in batches by a background thread,
+    so a create request does not grow with the author's follower count.
+    With RECIPE_FEED_FANOUT_WORKERS set to 0 the fan-out runs inline.
+    """
+    def submit():
+        if settings.RECIPE_FEED_FANOUT_WORKERS:
+            future = get_executor().submit(_fan_out_in_thread, recipe)
+            future.add_done_callback(_log_failure)
+        else:
+            fan_out_recipe(recipe)
+
+    transaction.on_commit(submit)
+
+
+def backfill_follow(follow):
+    recipes = Recipe.objects.filter(
+        author_id=follow.subcribed_to_id
+    ).values_list('id', 'pub_date')[:TIMELINE_BACKFILL_SIZE]
+    _bulk_insert(
+        TimelineEntry(user_id=follow.subscriber_id, recipe_id=recipe_id,
+                      pub_date=pub_date)
+        for recipe_id, pub_date in recipes
+    )
+
+
+def remove_follow(follow):
+    TimelineEntry.objects.filter(
+        user_id=follow.subscriber_id,
+        recipe__author_id=follow.subcribed_to_id,
+    ).delete()
+
+
+def rebuild_timelines(users=None):
+    """Refill timelines from Follow, for every user unless users given."""
+    entries = TimelineEntry.objects.all()
+    follows = Follow.objects.all()
+    if users is not None:
+        entries = entries.filter(user_id__in=users)
+        follows = follows.filter(subscriber_id__in=users)
+    entries.delete()
+    for follow in follows.iterator():
+        backfill_follow(follow)
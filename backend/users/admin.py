@@ -8,7 +8,9 @@ from . import models
 class UserAdmin(admin.ModelAdmin):
     list_display = (
         'username', 'first_name', 'last_name', 'email',
+        'recipes_count', 'followers_count',
     )
+    readonly_fields = ('recipes_count', 'followers_count')
     search_fields = ('username',)
     list_filter = ('username', 'email')
     ordering = ('username',)
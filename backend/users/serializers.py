@@ -1,22 +1,48 @@
 import djoser.serializers
+from django.utils.functional import SimpleLazyObject
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 from rest_framework.validators import UniqueTogetherValidator
 
 from .models import User, Follow
+from backend.constant_values import SUBSCRIPTIONS_RECIPES_LIMIT
+from recipes.images import rendition_urls
 from recipes.models import Recipe
 
 
+def get_subscribed_ids(user):
+    """Lazy set of author ids user follows, loaded once when first read."""
+    return SimpleLazyObject(lambda: set(
+        user.following.values_list('subcribed_to_id', flat=True)
+    ))
+
+
+def is_subscribed(context, author):
+    request = context.get('request')
+    if request is None or request.user.is_anonymous:
+        return False
+    subscribed_ids = context.get('subscribed_ids')
+    if subscribed_ids is not None:
+        return author.id in subscribed_ids
+    return request.user.following.filter(subcribed_to=author).exists()
+
+
 class SpecialRecipeSerializer(serializers.ModelSerializer):
+    image_renditions = SerializerMethodField(read_only=True)
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time',
         )
 
+    def get_image_renditions(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
 
 class CustomUserSerializer(djoser.serializers.UserSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
@@ -39,10 +65,7 @@ class CustomUserSerializer(djoser.serializers.UserSerializer):
         ]
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if self.context.get('request').user.is_anonymous:
-            return False
-        return obj.following.filter(subcribed_to=request.user).exists()
+        return is_subscribed(self.context, obj)
 
 
 class UserCreateSerializer(djoser.serializers.UserCreateSerializer):
@@ -98,7 +121,7 @@ class FollowSerializer(serializers.ModelSerializer):
 
 
 class FollowerSerializer(serializers.ModelSerializer):
-    recipes = SpecialRecipeSerializer(many=True, required=True)
+    recipes = serializers.SerializerMethodField('get_recipes')
     is_subscribed = serializers.SerializerMethodField('check_is_subscrobed')
     recipes_count = serializers.SerializerMethodField('get_recipes_count')
 
@@ -115,12 +138,18 @@ class FollowerSerializer(serializers.ModelSerializer):
             'recipes_count',
         ]
 
+    def get_recipes(self, obj):
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is None:
+            recipes = obj.recipes.all()[:SUBSCRIPTIONS_RECIPES_LIMIT]
+        else:
+            recipes = recipes_by_author.get(obj.id, [])
+        return SpecialRecipeSerializer(
+            recipes, many=True, context=self.context
+        ).data
+
     def get_recipes_count(self, obj):
-        count = obj.recipes.all().count()
-        return count
+        return obj.recipes_count
 
     def check_is_subscrobed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return obj.following.filter(subcribed_to=request.user).exists()
+        return is_subscribed(self.context, obj)
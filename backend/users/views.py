@@ -1,5 +1,10 @@
+from collections import defaultdict
+
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from rest_framework import status, viewsets
 from rest_framework.permissions import (
     IsAuthenticated,
@@ -14,8 +19,57 @@ from .serializers import (
     PasswordSerializer,
     FollowerSerializer,
     FollowSerializer,
+    get_subscribed_ids,
 )
 from .models import Follow, User
+from backend.constant_values import (SUBSCRIPTIONS_RECIPES_LIMIT,
+                                     SUBSCRIPTIONS_RECIPES_MAX)
+from recipes.counters import change_counter
+from recipes.models import Recipe
+from recipes.pagination import CountStrategyPaginator
+
+
+class SubscriptionsPagination(PageNumberPagination):
+    django_paginator_class = CountStrategyPaginator
+    page_size = 6
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return SUBSCRIPTIONS_RECIPES_LIMIT
+    if limit <= 0:
+        return SUBSCRIPTIONS_RECIPES_LIMIT
+    return min(limit, SUBSCRIPTIONS_RECIPES_MAX)
+
+
+def get_recent_recipes(author_ids, limit):
+    """Fetch the latest recipes of every author with a single query.
+
+    Recipes are ranked per author with ROW_NUMBER() and cut at limit in the
+    database, so prolific authors cost no more than anyone else.
+    """
+    recipes_by_author = defaultdict(list)
+    if not author_ids:
+        return recipes_by_author
+
+    ranked = Recipe.objects.filter(author_id__in=author_ids).annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )
+    ).order_by()
+    sql, params = ranked.query.sql_with_params()
+    recipes = Recipe.objects.raw(
+        f'SELECT * FROM ({sql}) ranked WHERE row_number <= %s '
+        'ORDER BY author_id, row_number',
+        (*params, limit)
+    )
+    for recipe in recipes:
+        recipes_by_author[recipe.author_id].append(recipe)
+    return recipes_by_author
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -24,6 +78,12 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     pagination_class = None
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.user.is_authenticated:
+            context['subscribed_ids'] = get_subscribed_ids(self.request.user)
+        return context
+
     @action(
         methods=['get'], detail=False, permission_classes=[IsAuthenticated]
     )
@@ -59,7 +119,7 @@ class UserViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
 
         user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        user.save(update_fields=['password'])
         return Response(status=status.HTTP_200_OK)
 
     @action(methods=['get', 'delete', 'post'],
@@ -76,12 +136,16 @@ class UserViewSet(viewsets.ModelViewSet):
         if request.method == 'GET' or request.method == 'POST':
             serializer = FollowSerializer(data=data, context=request)
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                change_counter(User, sub_to.id, 'followers_count', 1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
             if follow.exists():
-                follow.delete()
+                with transaction.atomic():
+                    follow.delete()
+                    change_counter(User, sub_to.id, 'followers_count', -1)
                 return Response(status=status.HTTP_204_NO_CONTENT)
 
             return Response(status=status.HTTP_404_NOT_FOUND)
@@ -93,16 +157,26 @@ class UserViewSet(viewsets.ModelViewSet):
         follows = user.following.all()
 
         subscribed_to_users = follows.values_list('subcribed_to', flat=True)
-        subscribed_users = User.objects.filter(pk__in=subscribed_to_users)
+        subscribed_users = User.objects.filter(
+            pk__in=subscribed_to_users
+        ).order_by('id')
 
-        paginator = PageNumberPagination()
-        paginator.page_size = 6
+        paginator = SubscriptionsPagination()
 
         result_page = paginator.paginate_queryset(subscribed_users, request)
+        recipes_by_author = get_recent_recipes(
+            [author.id for author in result_page],
+            get_recipes_limit(request),
+        )
         serializer = FollowerSerializer(
             result_page,
             many=True,
-            context={'current_user': user}
+            context={
+                'request': request,
+                'current_user': user,
+                'recipes_by_author': recipes_by_author,
+                'subscribed_ids': get_subscribed_ids(user),
+            }
         )
 
         return paginator.get_paginated_response(serializer.data)